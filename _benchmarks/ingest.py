@@ -0,0 +1,273 @@
+################################################################################
+# base._benchmarks.ingest
+#
+# Copyright 2017. Djamel Grine.
+#
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice, 
+#    this list of conditions and the following disclaimer in the documentation 
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" 
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE 
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE 
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE 
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR 
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF 
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN 
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) 
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE 
+# POSSIBILITY OF SUCH DAMAGE.
+################################################################################
+"""
+Benchmarks of the CSV ingest: UnicodeCSVReader, guess_convert, read_csv and
+write_csv, on synthetic files that are narrow (4 columns) or wide (40
+columns) and hold numeric, date or string columns.
+
+    python -m base._benchmarks.ingest run [--sizes 1000 10000 ...] [--output results.json]
+    python -m base._benchmarks.ingest compare before.json after.json
+
+Every run of a case is a process of its own, so that its peak RSS is its
+own and no cache, e.g. parse_date's, is warm. The peak RSS is reported as
+the growth over the RSS of the process before the case runs, and the cases
+stream the file, so that it is the memory of the code under test.
+The results, i.e. rows/s, MB/s and peak RSS per case, are written as JSON
+together with the commit they were measured at, so that two runs can be
+compared. The files are generated from a fixed seed, so they are the same
+from one run to the next.
+"""
+from base.utilities.conversion import guess_convert
+from base.utilities.csv import UnicodeCSVReader, iter_csv, read_csv, write_csv
+from base.utilities.texttable import Texttable
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+OPERATIONS = ['reader', 'guess_convert', 'read_csv', 'write_csv']
+SHAPES = {'narrow': 4, 'wide': 40}
+KINDS = ['numeric', 'date', 'string']
+SIZES = [1000, 10000, 100000, 1000000, 10000000]
+
+_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_words = ['gold', 'silver', 'copper', 'platinum', 'palladium', 'zinc', 'nickel', 'tin']
+
+def _numeric(generator, n):
+    return [
+        lambda: str(n),
+        lambda: '{:.4f}'.format(generator.uniform(-1000, 1000)),
+        lambda: str(generator.randint(0, 1 << 20)),
+        lambda: '{:.6e}'.format(generator.lognormvariate(0, 2)),
+    ][n % 4]()
+
+def _date(generator, n):
+    date = datetime.datetime(2000, 1, 1) + datetime.timedelta(seconds = generator.randint(0, 20 * 365 * 86400))
+    return [
+        lambda: date.strftime('%Y-%m-%d'),
+        lambda: date.strftime('%Y-%m-%d %H:%M:%S'),
+        lambda: date.strftime('%Y-%m'),
+        lambda: date.strftime('%d/%m/%Y'),
+    ][n % 4]()
+
+def _string(generator, n):
+    return [
+        lambda: generator.choice(_words),
+        lambda: '"{}, {}"'.format(generator.choice(_words), generator.choice(_words)),
+        lambda: '{}-{:05d}'.format(generator.choice(_words)[:2].upper(), generator.randint(0, 99999)),
+        lambda: '"said ""{}"""'.format(generator.choice(_words)),
+    ][n % 4]()
+
+_generators = {'numeric': _numeric, 'date': _date, 'string': _string}
+
+def generate_file(filename, shape, kind, nr_rows, seed = 0):
+    """
+    Writes a CSV file of nr_rows rows of the given shape and kind, in the
+    format write_csv produces.
+    """
+    generator = random.Random(seed)
+    generate = _generators[kind]
+    nr_columns = SHAPES[shape]
+    with open(filename, 'wb') as f:
+        f.write('\xef\xbb\xbf' + ','.join('{}{}'.format(kind, n) for n in range(nr_columns)) + '\r\n')
+        for _ in xrange(nr_rows):
+            f.write(','.join(generate(generator, n) for n in range(nr_columns)) + '\r\n')
+
+def _peak_rss():
+    """
+    Returns the peak resident set size of the process, in MB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / float(1 << 20) if 'darwin' == sys.platform else peak / 1024.
+
+class _TimedIterator(object):
+    """
+    Iterator over the given items, keeping the time spent producing them.
+    """
+    def __init__(self, items):
+        super(_TimedIterator, self).__init__()
+        self.items = iter(items)
+        self.duration = 0.
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        start = time.time()
+        try:
+            return next(self.items)
+        finally:
+            self.duration += time.time() - start
+
+def run_case(operation, filename):
+    """
+    Runs an operation on the file and returns its duration, in seconds, and
+    the number of bytes it processed. The file is streamed, and the time 
+    spent reading it only counts for the reader and read_csv operations.
+    """
+    if 'reader' == operation:
+        with open(filename, 'rb') as f:
+            start = time.time()
+            for _ in UnicodeCSVReader(f): pass
+            return time.time() - start, os.path.getsize(filename)
+    if 'guess_convert' == operation:
+        duration = 0.
+        with open(filename, 'rb') as f:
+            for row in UnicodeCSVReader(f):
+                start = time.time()
+                for cell in row: guess_convert(cell)
+                duration += time.time() - start
+        return duration, os.path.getsize(filename)
+    if 'read_csv' == operation:
+        with open(filename, 'rb') as f:
+            start = time.time()
+            read_csv(f)
+            return time.time() - start, os.path.getsize(filename)
+    if 'write_csv' == operation:
+        output = filename + '.out'
+        with open(filename, 'rb') as f:
+            records = _TimedIterator(iter_csv(f))
+            start = time.time()
+            write_csv(output, records)
+            duration = time.time() - start - records.duration
+        nr_bytes = os.path.getsize(output)
+        os.remove(output)
+        return duration, nr_bytes
+    raise ValueError("'{}' is not a known operation".format(operation))
+
+def _commit():
+    try:
+        with open(os.devnull, 'w') as devnull:
+            return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd = os.path.dirname(os.path.abspath(__file__)), stderr = devnull).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(operations, shapes, kinds, sizes, repeat, data_folder = None):
+    """
+    Runs all combinations of the given operations, shapes, kinds and sizes
+    repeat times, each run in a process of its own, and returns the results
+    of the fastest runs, along with the highest peak RSS.
+    """
+    folder = data_folder or tempfile.mkdtemp()
+    if not os.path.exists(folder): os.makedirs(folder)
+    environment = dict(os.environ, PYTHONPATH = os.pathsep.join(filter(None, [_root, os.environ.get('PYTHONPATH')])))
+    results = []
+    try:
+        for shape in shapes:
+            for kind in kinds:
+                for nr_rows in sizes:
+                    filename = os.path.join(folder, '{}-{}-{}.csv'.format(shape, kind, nr_rows))
+                    if not os.path.exists(filename): generate_file(filename, shape, kind, nr_rows)
+                    for operation in operations:
+                        runs = [
+                            json.loads(subprocess.check_output([sys.executable, '-m', 'base._benchmarks.ingest', 'case', operation, filename], env = environment))
+                            for _ in range(repeat)
+                        ]
+                        seconds, nr_bytes, _ = min(runs)
+                        peak_rss_mb = max(peak_rss_mb for _, _, peak_rss_mb in runs)
+                        results.append({
+                            'operation': operation, 'shape': shape, 'kind': kind, 'rows': nr_rows,
+                            'seconds': seconds, 'rows_per_s': nr_rows / seconds, 'mb_per_s': nr_bytes / float(1 << 20) / seconds,
+                            'peak_rss_mb': peak_rss_mb,
+                        })
+                        sys.stderr.write('{operation:<14} {shape:<7} {kind:<8} {rows:>9} rows {rows_per_s:>12,.0f} rows/s {mb_per_s:>8.2f} MB/s {peak_rss_mb:>9.1f} MB\n'.format(**results[-1]))
+    finally:
+        if data_folder is None: shutil.rmtree(folder)
+    return {
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'date': datetime.datetime.utcnow().isoformat(),
+        'repeat': repeat,
+        'results': results,
+    }
+
+def compare(before, after):
+    """
+    Returns a table comparing the rows/s and peak RSS of the cases found in
+    both results.
+    """
+    key = lambda result: (result['operation'], result['shape'], result['kind'], result['rows'])
+    before_results = {key(result): result for result in before['results']}
+    rows = [['Operation', 'Shape', 'Kind', 'Rows', 'Rows/s before', 'Rows/s after', 'Speedup', 'Peak RSS before (MB)', 'Peak RSS after (MB)']]
+    for result in after['results']:
+        previous = before_results.get(key(result))
+        if previous is None: continue
+        rows.append(list(key(result)) + [
+            int(previous['rows_per_s']), int(result['rows_per_s']), '{:.2f}x'.format(result['rows_per_s'] / previous['rows_per_s']),
+            previous['peak_rss_mb'], result['peak_rss_mb'],
+        ])
+    table = Texttable()
+    table.set_deco(Texttable.HEADER)
+    table.add_rows(rows)
+    return 'Before: {}\nAfter:  {}\n{}'.format(before['commit'], after['commit'], table.draw())
+
+def main(arguments):
+    parser = argparse.ArgumentParser(description = 'Benchmarks of utilities.csv and utilities.conversion')
+    commands = parser.add_subparsers(dest = 'command')
+    run_parser = commands.add_parser('run', help = 'Runs the benchmarks')
+    run_parser.add_argument('--operations', nargs = '+', choices = OPERATIONS, default = OPERATIONS)
+    run_parser.add_argument('--shapes', nargs = '+', choices = sorted(SHAPES), default = sorted(SHAPES))
+    run_parser.add_argument('--kinds', nargs = '+', choices = KINDS, default = KINDS)
+    run_parser.add_argument('--sizes', nargs = '+', type = int, default = SIZES[:3], help = 'Numbers of rows, e.g. {}'.format(' '.join(map(str, SIZES))))
+    run_parser.add_argument('--repeat', type = int, default = 3, help = 'Number of runs per case, of which the fastest one is kept')
+    run_parser.add_argument('--data-folder', help = 'Folder keeping the generated files between runs')
+    run_parser.add_argument('--output', help = 'JSON file of the results, standard output by default')
+    compare_parser = commands.add_parser('compare', help = 'Compares two JSON results')
+    compare_parser.add_argument('before')
+    compare_parser.add_argument('after')
+    case_parser = commands.add_parser('case', help = 'Runs a single case, in a process of its own')
+    case_parser.add_argument('operation', choices = OPERATIONS)
+    case_parser.add_argument('filename')
+    arguments = parser.parse_args(arguments)
+
+    if 'run' == arguments.command:
+        results = json.dumps(run(arguments.operations, arguments.shapes, arguments.kinds, arguments.sizes, arguments.repeat, arguments.data_folder), indent = 2, sort_keys = True)
+        if arguments.output is None: print(results)
+        else:
+            with open(arguments.output, 'w') as f: f.write(results)
+    elif 'compare' == arguments.command:
+        with open(arguments.before) as f: before = json.load(f)
+        with open(arguments.after) as f: after = json.load(f)
+        print(compare(before, after))
+    elif 'case' == arguments.command:
+        baseline = _peak_rss()
+        seconds, nr_bytes = run_case(arguments.operation, arguments.filename)
+        print(json.dumps([seconds, nr_bytes, _peak_rss() - baseline]))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,79 @@
+################################################################################
+# base._benchmarks.records
+#
+# Copyright 2017. Djamel Grine.
+#
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice, 
+#    this list of conditions and the following disclaimer in the documentation 
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" 
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE 
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE 
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE 
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR 
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF 
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN 
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) 
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE 
+# POSSIBILITY OF SUCH DAMAGE.
+################################################################################
+"""
+Measures how fast read_csv creates its records, on a file of 1M rows by 
+default:
+
+    python -m base._benchmarks.records [nr_rows]
+
+The values are either left as strings, so that the records' construction
+dominates, or converted as per a schema.
+"""
+from base.utilities.csv import read_csv
+import os
+import sys
+import tempfile
+import time
+
+_schema = {'date': 'date', 'value': 'float', 'name': 'str', 'count': 'int'}
+
+_cases = [
+    ('strings, namedtuple', dict(guess_data_types = False)),
+    ('strings, tuple', dict(guess_data_types = False, record_type = 'tuple')),
+    ('schema, namedtuple', dict(schema = _schema)),
+    ('schema, tuple', dict(schema = _schema, record_type = 'tuple')),
+]
+
+def write_file(filename, nr_rows):
+    with open(filename, 'wb') as f:
+        f.write('date,value,name,count\r\n')
+        for n in xrange(nr_rows):
+            f.write('2016-10-{:02d},{}.5,gold,{}\r\n'.format(n % 28 + 1, n, n))
+
+def measure(filename, **kwargs):
+    """
+    Returns the number of records read and the time it took, in seconds.
+    """
+    with open(filename, 'rb') as f:
+        start = time.time()
+        nr_records = len(read_csv(f, **kwargs))
+        return nr_records, time.time() - start
+
+def main(nr_rows):
+    fd, filename = tempfile.mkstemp(suffix = '.csv')
+    os.close(fd)
+    try:
+        write_file(filename, nr_rows)
+        for name, kwargs in _cases:
+            nr_records, duration = measure(filename, **kwargs)
+            print('{:<20} {:>8.2f} s {:>12,.0f} rows/s'.format(name, duration, nr_records / duration))
+    finally:
+        os.remove(filename)
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
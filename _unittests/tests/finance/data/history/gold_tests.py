@@ -26,8 +26,10 @@
 # POSSIBILITY OF SUCH DAMAGE.
 ################################################################################
 from base.finance.data.history.gold import GoldHistory
+from base.finance.timeseries import Timeseries, registry
 from testing import TestCase 
 from datetime import datetime
+import collections
 import matplotlib.pyplot as plt
 
 def diff_month(d1, d2):
@@ -53,3 +55,15 @@ class Test_GoldHistory(TestCase):
     def test_plot(self):
         self.history.timeseries.plot()
         # plt.show()
+
+class Test_GoldHistoryRegistered(TestCase):
+    def tearDown(self):
+        registry.invalidate('gold')
+
+    def test_lazy_registered(self):
+        Record = collections.namedtuple('Record', 'date value')
+        registry.invalidate('gold')
+        timeseries = registry.get('gold', lambda: Timeseries('gold', lazy = True))
+        timeseries._get_data = lambda: [Record(date = datetime(2000, 1, 1), value = 1.)]
+        self.assertFalse(GoldHistory(lazy = True).timeseries.loaded)
+        self.assertTrue(GoldHistory().timeseries.loaded)
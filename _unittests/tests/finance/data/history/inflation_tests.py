@@ -25,6 +25,7 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE 
 # POSSIBILITY OF SUCH DAMAGE.
 ################################################################################
+from base.finance.data.history.cpi import CPIHistory
 from base.finance.data.history.inflation import InflationHistory
 from testing import TestCase
 import matplotlib.pyplot as plt
@@ -36,3 +37,9 @@ class Test_InflationHistory(TestCase):
     def test_plot(self):
         self.history.timeseries.plot()
         # plt.show()
+
+    def test_inflation(self):
+        cpi = CPIHistory()
+        for p in self.history.inflation_numbers:
+            previous_cpi = cpi.cpi(p.date.replace(year = p.date.year - 1))
+            self.assertEqual(1. - previous_cpi.value / cpi.cpi(p.date).value, p.value)
@@ -0,0 +1,164 @@
+################################################################################
+# base._unittests.tests.finance.data.history.sources.bundesbank_tests
+#
+# Copyright 2017. Djamel Grine.
+#
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice, 
+#    this list of conditions and the following disclaimer in the documentation 
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" 
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE 
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE 
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE 
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR 
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF 
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN 
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) 
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE 
+# POSSIBILITY OF SUCH DAMAGE.
+################################################################################
+from base.finance.data.history.sources.bundesbank import Timeseries, load_timeseries
+from base.finance.timeseries import Records, TimeseriesRegistry
+from testing import TestCase
+from datetime import date
+import base.utilities.conversion
+import BaseHTTPServer
+import SocketServer
+import functools
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+def monthly_lines(nr_months, offset):
+    return ['{}-{:02d},{}.5'.format(1999 + n // 12, 1 + n % 12, offset + n) for n in range(nr_months)]
+
+class StubServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+class StubHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Serves the server's body, honoring conditional requests on its ETag.
+    """
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        time.sleep(self.server.delay)
+        if self.headers.getheader('If-None-Match') == self.server.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/csv')
+        self.send_header('ETag', self.server.etag)
+        self.end_headers()
+        self.wfile.write(self.server.body)
+
+    def log_message(self, *args): pass
+
+class StubTimeseries(Timeseries):
+    """
+    Timeseries caching in a given folder, which is always considered stale.
+    """
+    def __init__(self, folder, *args, **kwargs):
+        self.cache_folder = folder
+        super(StubTimeseries, self).__init__(*args, **kwargs)
+
+    def _is_stale(self, data): return True
+
+class Test_Bundesbank(TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.server = StubServer(('127.0.0.1', 0), StubHandler)
+        self.server.requests = []
+        self.server.delay = 0
+        self.serve(monthly_lines(12, 250), 'v1')
+        thread = threading.Thread(target = self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.url = 'http://127.0.0.1:{}/series.csv'.format(self.server.server_port)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.folder)
+
+    def serve(self, lines, etag):
+        self.server.body = '\r\n'.join([',BBEX3.M.XAU.EUR.EA.AC.C06', 'unit,EUR'] + lines) + '\r\n'
+        self.server.etag = etag
+
+    def timeseries(self):
+        return StubTimeseries(self.folder, self.url, 'series')
+
+    def csv_content(self, timeseries):
+        with open(timeseries.cached_file, 'rb') as f: return f.read()
+
+    def test_not_modified(self):
+        data = list(self.timeseries().data)
+        timeseries = self.timeseries()
+        self.assertEqual('v1', self.server.requests[-1]['if-none-match'])
+        self.assertEqual(data, list(timeseries.data))
+        self.assertIsInstance(timeseries.data, Records)
+
+    def test_append(self):
+        timeseries = self.timeseries()
+        data = list(timeseries.data)
+        content = self.csv_content(timeseries)
+        self.serve(monthly_lines(14, 250), 'v2')
+        timeseries = self.timeseries()
+        self.assertEqual(len(data) + 2, len(timeseries.data))
+        self.assertEqual(data, list(timeseries.data[:len(data)]))
+        self.assertEqual(263.5, timeseries.data[-1].value)
+        self.assertTrue(self.csv_content(timeseries).startswith(content))
+        self.assertEqual(list(timeseries.data), list(timeseries._get_data_offline()))
+        os.remove(timeseries.cached_binary_file)
+        self.assertEqual(list(timeseries.data), list(timeseries._get_data_offline()))
+        self.assertEqual({'etag': 'v2'}, timeseries._read_validators())
+
+    def test_append_other_day(self):
+        class Today(date):
+            day = 2
+            @classmethod
+            def today(cls): return cls(2017, 10, Today.day)
+        conversion_date = base.utilities.conversion.date
+        base.utilities.conversion.date = Today
+        try:
+            data = list(self.timeseries().data)
+            content = self.csv_content(self.timeseries())
+            Today.day = 17
+            self.serve(monthly_lines(14, 250), 'v2')
+            timeseries = self.timeseries()
+        finally:
+            base.utilities.conversion.date = conversion_date
+        self.assertEqual(1, data[-1].date.day)
+        self.assertEqual(data, list(timeseries.data[:len(data)]))
+        self.assertTrue(self.csv_content(timeseries).startswith(content))
+
+    def test_revised(self):
+        data = self.timeseries().data
+        self.serve(monthly_lines(13, 260), 'v2')
+        timeseries = self.timeseries()
+        self.assertEqual(len(data) + 1, len(timeseries.data))
+        self.assertEqual(261.5, timeseries.data[0].value)
+        self.assertEqual(list(timeseries.data), list(timeseries._get_data_offline()))
+
+    def test_load_timeseries(self):
+        self.server.delay = 0.5
+        specs = [{'url': '{}?n={}'.format(self.url, n), 'series_name': 'series{}'.format(n)} for n in range(4)]
+        start = time.time()
+        registry = TimeseriesRegistry()
+        timeseries = load_timeseries(specs, timeseries_class = functools.partial(StubTimeseries, self.folder), registry = registry)
+        self.assertLess(time.time() - start, len(specs) * self.server.delay)
+        self.assertEqual(len(specs), len(self.server.requests))
+        self.assertEqual([spec['series_name'] for spec in specs], [t.series_name for t in timeseries])
+        self.assertEqual(list(self.timeseries().data), list(timeseries[0].data))
+        self.assertEqual([], load_timeseries([]))
+        self.assertIs(timeseries[1], registry.get('series1', None))
@@ -0,0 +1,103 @@
+################################################################################
+# base._unittests.tests.finance.derived_tests
+#
+# Copyright 2017. Djamel Grine.
+#
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice, 
+#    this list of conditions and the following disclaimer in the documentation 
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" 
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE 
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE 
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE 
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR 
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF 
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN 
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) 
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE 
+# POSSIBILITY OF SUCH DAMAGE.
+################################################################################
+from base.finance.derived import DerivedTimeseries
+from base.finance.timeseries import Timeseries, Records
+from testing import TestCase
+from datetime import datetime
+import collections
+import os
+import shutil
+import tempfile
+
+Record = collections.namedtuple('Record', 'date value')
+
+class CachedDerivedTimeseries(DerivedTimeseries):
+    """
+    Derived timeseries caching in a given folder.
+    """
+    def __init__(self, folder, *args, **kwargs):
+        self.cache_folder = folder
+        super(CachedDerivedTimeseries, self).__init__(*args, **kwargs)
+
+def monthly(name, values):
+    return Timeseries(name, data = [Record(date = datetime(2000 + n // 12, 1 + n % 12, 1), value = value) for n, value in enumerate(values)])
+
+class Test_DerivedTimeseries(TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.nr_computations = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def spread(self, first, second):
+        self.nr_computations += 1
+        return Records(first.dates, first.values_array - second.values_array)
+
+    def derived(self, *parents):
+        return CachedDerivedTimeseries(self.folder, 'spread', parents, self.spread)
+
+    def test_unchanged_parents(self):
+        first, second = monthly('first', [3., 4., 5.]), monthly('second', [1., 1., 1.])
+        self.assertEqual([2., 3., 4.], self.derived(first, second).values_array.tolist())
+        self.assertEqual([2., 3., 4.], self.derived(lambda: first, lambda: second).values_array.tolist())
+        self.assertEqual(1, self.nr_computations)
+
+    def test_changed_parent(self):
+        self.derived(monthly('first', [3., 4., 5.]), monthly('second', [1., 1., 1.]))
+        with open(os.path.join(self.folder, 'spread.csv'), 'rb') as f: content = f.read()
+        timeseries = self.derived(monthly('first', [3., 4., 5., 6.]), monthly('second', [1., 1., 1., 1.]))
+        self.assertEqual(2, self.nr_computations)
+        self.assertEqual([2., 3., 4., 5.], timeseries.values_array.tolist())
+        with open(os.path.join(self.folder, 'spread.csv'), 'rb') as f: self.assertTrue(f.read().startswith(content))
+        timeseries = self.derived(monthly('first', [3., 4., 5., 6.]), monthly('second', [2., 2., 2., 2.]))
+        self.assertEqual(3, self.nr_computations)
+        self.assertEqual([1., 2., 3., 4.], timeseries.values_array.tolist())
+        self.assertEqual(timeseries.data, list(timeseries._get_data_offline()))
+
+    def test_revision_outside_tail(self):
+        values = [float(n) for n in range(24)]
+        self.derived(monthly('first', values), monthly('second', [0.] * 24))
+        values[0] = 100.
+        timeseries = self.derived(monthly('first', values), monthly('second', [0.] * 24))
+        self.assertEqual(values, timeseries.values_array.tolist())
+        self.assertEqual(values, [p.value for p in timeseries._get_data_offline()])
+        self.assertEqual(values, self.derived(monthly('first', values), monthly('second', [0.] * 24)).values_array.tolist())
+        self.assertEqual(2, self.nr_computations)
+
+    def test_derived_parent(self):
+        first, second = monthly('first', [3., 4., 5.]), monthly('second', [1., 1., 1.])
+        spread = self.derived(first, second)
+        double = CachedDerivedTimeseries(self.folder, 'double', [spread], lambda parent: Records(parent.dates, 2 * parent.values_array))
+        self.assertEqual([4., 6., 8.], double.values_array.tolist())
+        self.assertEqual({'parents': [spread.version]}, double._read_validators())
+
+    def test_parents_sharing_name(self):
+        self.assertEqual([0., 1., 2.], self.derived(monthly('gold', [1., 2., 3.]), monthly('gold', [1., 1., 1.])).values_array.tolist())
+        timeseries = self.derived(monthly('gold', [101., 102., 103.]), monthly('gold', [1., 1., 1.]))
+        self.assertEqual([100., 101., 102.], timeseries.values_array.tolist())
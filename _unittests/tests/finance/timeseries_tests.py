@@ -0,0 +1,375 @@
+################################################################################
+# base._unittests.tests.finance.timeseries_tests
+#
+# Copyright 2017. Djamel Grine.
+#
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice, 
+#    this list of conditions and the following disclaimer in the documentation 
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" 
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE 
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE 
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE 
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR 
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF 
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN 
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) 
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE 
+# POSSIBILITY OF SUCH DAMAGE.
+################################################################################
+from base.finance.timeseries import Timeseries, TimeseriesRegistry, SharedTimeseries, Records, load_columns, largest_triangle_three_buckets
+from base.utilities.misc import nearest_elements
+from testing import TestCase
+from datetime import datetime, timedelta
+import collections
+import math
+import multiprocessing
+import matplotlib.pyplot as plt
+import numpy as np
+import os
+import pickle
+import random
+import shutil
+import tempfile
+
+Record = collections.namedtuple('Record', 'date value')
+
+def linear_scan(data, date):
+    def nearest_date(p1, p2): return math.fabs((p1.date - p2.date).days)
+    return nearest_elements([Record(date = date, value = 0)], data, distance = nearest_date)[0]
+
+class CachedTimeseries(Timeseries):
+    """
+    Timeseries caching in a given folder, with the online data set up front.
+    """
+    def __init__(self, folder, online_data, *args, **kwargs):
+        self.cache_folder = folder
+        self.online_data = online_data
+        self.nr_online_requests = 0
+        super(CachedTimeseries, self).__init__(*args, **kwargs)
+
+    def _get_data_online(self):
+        self.nr_online_requests += 1
+        return self.online_data
+
+def shared_value(name, date, queue):
+    queue.put(SharedTimeseries(name).value(date))
+
+class Test_Timeseries(TestCase):
+    def setUp(self):
+        start = datetime(2000, 1, 2)
+        data = [Record(date = start + timedelta(days = 30 * n), value = float(n)) for n in range(24)]
+        self.timeseries = Timeseries('test', data = data)
+
+    def test_value_exact(self):
+        for p in self.timeseries.data:
+            self.assertEqual(p, self.timeseries.value(p.date))
+
+    def test_value_out_of_range(self):
+        data = self.timeseries.data
+        self.assertEqual(data[0], self.timeseries.value(datetime(1990, 1, 1)))
+        self.assertEqual(data[-1], self.timeseries.value(datetime(2030, 1, 1)))
+
+    def test_value_tie(self):
+        # Halfway between two points: the earlier one wins
+        data = self.timeseries.data
+        self.assertEqual(data[3], self.timeseries.value(data[3].date + timedelta(days = 15)))
+
+    def test_value_matches_linear_scan(self):
+        random.seed(0)
+        start = datetime(2000, 1, 1)
+        dates = sorted(start + timedelta(hours = random.randint(0, 24 * 90)) for _ in range(200))
+        data = [Record(date = date, value = float(n)) for n, date in enumerate(dates)]
+        timeseries = Timeseries('test', data = data)
+        for _ in range(1000):
+            date = start + timedelta(hours = random.randint(-24 * 5, 24 * 95), minutes = random.randint(0, 59))
+            self.assertIs(linear_scan(data, date), timeseries.value(date))
+
+    def test_values(self):
+        data = self.timeseries.data
+        dates = [p.date + timedelta(days = shift) for p in data for shift in (-20, -15, 0, 15, 20)]
+        self.assertEqual([self.timeseries.value(date) for date in dates], self.timeseries.values(dates))
+        self.assertEqual([self.timeseries.value(date).value for date in dates], self.timeseries.values(dates, as_array = True).tolist())
+        self.assertEqual(self.timeseries.values(dates), self.timeseries.values(np.array(dates, dtype = 'datetime64[us]')))
+
+    def test_values_matches_linear_scan(self):
+        random.seed(0)
+        start = datetime(2000, 1, 1)
+        for data_order in (sorted, lambda dates: dates):
+            dates = data_order([start + timedelta(hours = random.randint(0, 24 * 90)) for _ in range(200)])
+            data = [Record(date = date, value = float(n)) for n, date in enumerate(dates)]
+            timeseries = Timeseries('test', data = data)
+            dates = [start + timedelta(hours = random.randint(-24 * 5, 24 * 95), minutes = random.randint(0, 59)) for _ in range(1000)]
+            for date, p in zip(dates, timeseries.values(dates)): self.assertIs(linear_scan(data, date), p)
+            for date in dates: self.assertIs(linear_scan(data, date), timeseries.value(date))
+
+    def test_value_methods(self):
+        data = self.timeseries.data
+        date = data[3].date + timedelta(days = 6)
+        self.assertEqual(data[3], self.timeseries.value(date, method = 'previous'))
+        self.assertEqual(data[4], self.timeseries.value(date, method = 'next'))
+        self.assertEqual(data[3], self.timeseries.value(data[3].date, method = 'previous'))
+        self.assertEqual(data[3], self.timeseries.value(data[3].date, method = 'next'))
+        self.assertEqual(Record(date = date, value = 3.2), self.timeseries.value(date, method = 'linear'))
+        self.assertEqual(data[3], self.timeseries.value(data[3].date, method = 'linear'))
+        before, after = datetime(1990, 1, 1), datetime(2030, 1, 1)
+        for method in ('previous', 'next', 'linear'):
+            self.assertEqual(data[0].value, self.timeseries.value(before, method = method).value)
+            self.assertEqual(data[-1].value, self.timeseries.value(after, method = method).value)
+        self.assertRaises(ValueError, self.timeseries.value, date, method = 'cubic')
+
+    def test_values_methods(self):
+        data = self.timeseries.data
+        dates = [datetime(1990, 1, 1), datetime(2030, 1, 1)] + [p.date + timedelta(days = shift) for p in data for shift in (-20, 0, 7)]
+        for method in ('nearest', 'previous', 'next', 'linear'):
+            expected = [self.timeseries.value(date, method = method) for date in dates]
+            self.assertEqual(expected, self.timeseries.values(dates, method = method))
+            self.assertEqual([p.value for p in expected], self.timeseries.values(dates, as_array = True, method = method).tolist())
+
+    def test_columnar(self):
+        data = self.timeseries.data
+        timeseries = Timeseries('test', data = data, columnar = True)
+        self.assertEqual(len(data), len(timeseries.data))
+        self.assertEqual(data, list(timeseries.data))
+        self.assertEqual(data[5], timeseries.data[5])
+        self.assertEqual(data[-1], timeseries.data[-1])
+        self.assertEqual(data[2:7], list(timeseries.data[2:7]))
+        self.assertEqual(data[0].date, timeseries.start_date)
+        self.assertEqual(data[-1].date, timeseries.end_date)
+        self.assertEqual(np.dtype('datetime64[us]'), timeseries.dates.dtype)
+        self.assertEqual(np.dtype('float64'), timeseries.values_array.dtype)
+        self.assertIs(timeseries.dates, timeseries.data.dates)
+        date = data[7].date + timedelta(days = 3)
+        self.assertEqual(self.timeseries.value(date), timeseries.value(date))
+
+    def test_resample(self):
+        data = [Record(date = datetime(2000, 1, 1) + timedelta(days = n), value = float(n)) for n in range(366)]
+        timeseries = Timeseries('daily', 'Daily', 'EUR', data = data)
+        monthly = timeseries.resample('M', how = 'last')
+        self.assertEqual(12, len(monthly.data))
+        self.assertEqual('Daily', monthly.description)
+        self.assertEqual(Record(date = datetime(2000, 1, 31), value = 30.), monthly.data[0])
+        self.assertEqual(Record(date = datetime(2000, 2, 29), value = 59.), monthly.data[1])
+        self.assertEqual(Record(date = datetime(2000, 12, 31), value = 365.), monthly.data[-1])
+        self.assertEqual([0., 31.], timeseries.resample('M', how = 'first').values_array[:2].tolist())
+        self.assertEqual([15., 45.], timeseries.resample('M', how = 'mean').values_array[:2].tolist())
+        self.assertEqual([465., 1305.], timeseries.resample('M', how = 'sum').values_array[:2].tolist())
+        self.assertEqual([0., 31.], timeseries.resample('M', how = 'min').values_array[:2].tolist())
+        self.assertEqual([30., 59.], timeseries.resample('M', how = 'max').values_array[:2].tolist())
+        quarterly = timeseries.resample('Q', how = 'max')
+        self.assertEqual([datetime(2000, 3, 31), datetime(2000, 6, 30), datetime(2000, 9, 30), datetime(2000, 12, 31)], [p.date for p in quarterly.data])
+        self.assertEqual([Record(date = datetime(2000, 12, 31), value = 365.)], list(timeseries.resample('A', how = 'max').data))
+        self.assertRaises(ValueError, timeseries.resample, 'X')
+        self.assertRaises(ValueError, timeseries.resample, 'M', how = 'median')
+
+    def test_rolling(self):
+        random.seed(0)
+        data = [Record(date = datetime(2000, 1, 1) + timedelta(days = n), value = random.uniform(1000., 1100.)) for n in range(100)]
+        timeseries = Timeseries('daily', data = data)
+        values = np.array([p.value for p in data])
+        for window in (1, 2, 7, 30, 100):
+            windows = [values[n:n + window] for n in range(len(values) - window + 1)]
+            rolling = timeseries.rolling(window, how = 'mean')
+            self.assertEqual([p.date for p in data[window - 1:]], [p.date for p in rolling.data])
+            for how, statistic in (('mean', np.mean), ('sum', np.sum), ('min', np.min), ('max', np.max)):
+                expected = [statistic(w) for w in windows]
+                for lhs, rhs in zip(expected, timeseries.rolling(window, how = how).values_array): self.assertAlmostEqual(lhs, rhs, places = 7)
+            if window > 1:
+                expected = [np.std(w, ddof = 1) for w in windows]
+                for lhs, rhs in zip(expected, timeseries.rolling(window, how = 'std').values_array): self.assertAlmostEqual(lhs, rhs, places = 7)
+        self.assertRaises(ValueError, timeseries.rolling, 0)
+        self.assertRaises(ValueError, timeseries.rolling, 101)
+        self.assertRaises(ValueError, timeseries.rolling, 5, how = 'median')
+
+    def test_rolling_nan(self):
+        values = [0., 1., np.nan, 3., 4., 5.]
+        timeseries = Timeseries('nan', data = [Record(date = datetime(2000, 1, 1) + timedelta(days = n), value = value) for n, value in enumerate(values)])
+        for how, expected in (('mean', [0.5, None, None, 3.5, 4.5]), ('sum', [1., None, None, 7., 9.]), ('min', [0., None, None, 3., 4.]), ('max', [1., None, None, 4., 5.])):
+            rolling = timeseries.rolling(2, how = how).values_array
+            self.assertEqual(expected, [None if np.isnan(value) else value for value in rolling])
+        rolling = timeseries.rolling(2, how = 'std').values_array
+        self.assertEqual([False, True, True, False, False], np.isnan(rolling).tolist())
+        self.assertAlmostEqual(np.std([3., 4.], ddof = 1), rolling[3], places = 7)
+
+    def test_align(self):
+        first = Timeseries('first', data = [Record(date = datetime(2000, month, 2), value = float(month)) for month in range(1, 7)])
+        second = Timeseries('second', data = [Record(date = datetime(2000, month, 2), value = 10. * month) for month in range(4, 10)])
+        aligned_first, aligned_second = first.align(second, how = 'inner')
+        self.assertEqual([datetime(2000, month, 2) for month in range(4, 7)], [p.date for p in aligned_first.data])
+        self.assertEqual([4., 5., 6.], aligned_first.values_array.tolist())
+        self.assertEqual([40., 50., 60.], aligned_second.values_array.tolist())
+        aligned_first, aligned_second = first.align(second, how = 'outer')
+        self.assertEqual(9, len(aligned_first.data))
+        self.assertEqual([False] * 6 + [True] * 3, np.isnan(aligned_first.values_array).tolist())
+        self.assertEqual([True] * 3 + [False] * 6, np.isnan(aligned_second.values_array).tolist())
+        aligned_first, aligned_second = second.align(first, how = 'asof')
+        self.assertTrue(aligned_first.columnar)
+        self.assertEqual(second.data, list(aligned_first.data))
+        self.assertEqual([4., 5., 6., 6., 6., 6.], aligned_second.values_array.tolist())
+        aligned_first, aligned_second = first.align(second, how = 'asof')
+        self.assertEqual(3, np.sum(np.isnan(aligned_second.values_array)))
+        self.assertRaises(ValueError, first.align, second, how = 'nearest')
+
+    def test_largest_triangle_three_buckets(self):
+        x = np.arange(1000, dtype = np.float64)
+        y = np.sin(x / 50.)
+        y[637] = 10.
+        positions = largest_triangle_three_buckets(x, y, 50)
+        self.assertEqual(50, len(positions))
+        self.assertEqual(0, positions[0])
+        self.assertEqual(999, positions[-1])
+        self.assertTrue(np.all(np.diff(positions) > 0))
+        self.assertIn(637, positions)
+        self.assertEqual(list(range(10)), largest_triangle_three_buckets(x[:10], y[:10], 50).tolist())
+
+    def test_plot(self):
+        self.timeseries.plot()
+        self.timeseries.plot(max_points = 10)
+        self.assertEqual(10, len(plt.gca().get_lines()[0].get_xdata()))
+        plt.close('all')
+
+class Test_TimeseriesCache(TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        start = datetime(2000, 1, 2)
+        self.data = [Record(date = start + timedelta(days = 30 * n), value = n + 0.5) for n in range(24)]
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_binary_cache(self):
+        timeseries = CachedTimeseries(self.folder, self.data, 'test')
+        self.assertEqual(1, timeseries.nr_online_requests)
+        self.assertTrue(os.path.exists(timeseries.cached_file))
+        self.assertTrue(os.path.exists(timeseries.cached_binary_file))
+        data = timeseries._get_data_offline()
+        self.assertIsInstance(data, Records)
+        self.assertEqual(self.data, list(data))
+        timeseries = CachedTimeseries(self.folder, None, 'test', columnar = True)
+        self.assertEqual(0, timeseries.nr_online_requests)
+        self.assertEqual(self.data, list(timeseries.data))
+
+    def test_binary_cache_rebuilt_from_csv(self):
+        timeseries = CachedTimeseries(self.folder, self.data, 'test')
+        with open(timeseries.cached_binary_file, 'wb') as f: np.save(f, np.arange(3))
+        self.assertIsNone(load_columns(timeseries.cached_binary_file))
+        timeseries = CachedTimeseries(self.folder, None, 'test')
+        self.assertEqual(0, timeseries.nr_online_requests)
+        self.assertEqual(self.data, timeseries.data)
+        self.assertEqual(self.data, list(load_columns(timeseries.cached_binary_file)))
+
+    def test_compressed_cache(self):
+        class CompressedTimeseries(CachedTimeseries):
+            csv_extension = '.csv.gz'
+        timeseries = CompressedTimeseries(self.folder, self.data[:20], 'test')
+        self.assertTrue(timeseries.cached_file.endswith('test.csv.gz'))
+        timeseries._append_cache(timeseries.data, self.data[20:])
+        os.remove(timeseries.cached_binary_file)
+        timeseries = CompressedTimeseries(self.folder, None, 'test')
+        self.assertEqual(0, timeseries.nr_online_requests)
+        self.assertEqual(self.data, list(timeseries.data))
+        CompressedTimeseries.csv_extension = '.csv.bz2'
+        os.remove(timeseries.cached_binary_file)
+        timeseries = CompressedTimeseries(self.folder, self.data[:20], 'test')
+        timeseries._append_cache(timeseries.data, self.data[20:])
+        os.remove(timeseries.cached_binary_file)
+        self.assertEqual(self.data, list(timeseries._get_data_offline()))
+
+    def test_lazy(self):
+        timeseries = CachedTimeseries(self.folder, self.data, 'test', lazy = True)
+        self.assertFalse(timeseries.loaded)
+        self.assertEqual(0, timeseries.nr_online_requests)
+        self.assertFalse(os.path.exists(timeseries.cached_file))
+        self.assertEqual(self.data[0].date, timeseries.start_date)
+        self.assertTrue(timeseries.loaded)
+        self.assertEqual(1, timeseries.nr_online_requests)
+        for access in (lambda t: t.data, lambda t: t.end_date, lambda t: t.value(datetime(2001, 1, 1)), lambda t: t.dates):
+            timeseries = CachedTimeseries(self.folder, None, 'test', lazy = True)
+            self.assertFalse(timeseries.loaded)
+            access(timeseries)
+            self.assertTrue(timeseries.loaded)
+
+class Test_TimeseriesRegistry(TestCase):
+    def setUp(self):
+        self.nr_loads = 0
+
+    def load(self):
+        self.nr_loads += 1
+        return Timeseries('test', data = [Record(date = datetime(2000, month, 1), value = float(month)) for month in range(1, 13)])
+
+    def test_shared(self):
+        registry = TimeseriesRegistry()
+        timeseries = registry.get('test', self.load)
+        self.assertIs(timeseries, registry.get('test', self.load))
+        self.assertEqual(1, self.nr_loads)
+
+    def test_read_only(self):
+        timeseries = TimeseriesRegistry().get('test', self.load)
+        def assign(sequence): sequence[0] = sequence[1]
+        self.assertRaises(TypeError, assign, timeseries.data)
+        self.assertRaises(ValueError, assign, timeseries.values_array)
+        timeseries = TimeseriesRegistry().get('lazy', lambda: Timeseries('lazy', lazy = True))
+        timeseries._get_data = lambda: list(self.load().data)
+        self.assertRaises(TypeError, assign, timeseries.data)
+
+    def test_ttl(self):
+        registry = TimeseriesRegistry(ttl = 0)
+        self.assertIsNot(registry.get('test', self.load), registry.get('test', self.load))
+        self.assertEqual(2, self.nr_loads)
+        registry.ttl = None
+        self.assertIs(registry.get('test', self.load), registry.get('test', self.load))
+        self.assertEqual(2, self.nr_loads)
+
+    def test_ttl_from_load(self):
+        registry = TimeseriesRegistry(ttl = 0)
+        timeseries = registry.get('lazy', lambda: Timeseries('lazy', lazy = True))
+        self.assertIs(timeseries, registry.get('lazy', lambda: Timeseries('lazy', lazy = True)))
+        timeseries._get_data = lambda: list(self.load().data)
+        timeseries.load()
+        self.assertIsNot(timeseries, registry.get('lazy', lambda: Timeseries('lazy', lazy = True)))
+
+    def test_invalidate(self):
+        registry = TimeseriesRegistry()
+        registry.get('test', self.load)
+        registry.invalidate('test')
+        registry.get('test', self.load)
+        registry.invalidate()
+        registry.get('test', self.load)
+        self.assertEqual(3, self.nr_loads)
+
+class Test_SharedTimeseries(TestCase):
+    def setUp(self):
+        data = [Record(date = datetime(2000, month, 2), value = float(month)) for month in range(1, 13)]
+        self.timeseries = Timeseries('test', 'Test', 'EUR', data = data)
+        self.shared = SharedTimeseries.publish(self.timeseries, 'shared_timeseries_tests')
+
+    def tearDown(self):
+        self.shared.unlink()
+
+    def test_attach(self):
+        timeseries = SharedTimeseries('shared_timeseries_tests')
+        self.assertEqual(self.timeseries.data, list(timeseries.data))
+        self.assertEqual(('test', 'Test', 'EUR'), (timeseries.series_name, timeseries.description, timeseries.unit))
+        self.assertIsInstance(timeseries.dates.base, np.memmap)
+        self.assertFalse(timeseries.values_array.flags.writeable)
+
+    def test_pickle(self):
+        timeseries = pickle.loads(pickle.dumps(self.shared))
+        self.assertEqual(self.timeseries.data, list(timeseries.data))
+        self.assertEqual(self.timeseries.data, pickle.loads(pickle.dumps(self.timeseries)).data)
+
+    def test_process(self):
+        date = datetime(2000, 5, 20)
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target = shared_value, args = ('shared_timeseries_tests', date, queue))
+        process.start()
+        self.assertEqual(self.timeseries.value(date), queue.get(timeout = 10))
+        process.join()
@@ -25,9 +25,10 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE 
 # POSSIBILITY OF SUCH DAMAGE.
 ################################################################################
-from base.utilities.conversion import guess_convert
+from base.utilities.conversion import guess_convert, infer_type, make_converter, parse_date
 from testing import TestCase, LogCapture
 from datetime import datetime
+import dateutil.parser
 
 def is_ok(lhs, rhs):
     return (lhs == rhs) and (type(lhs) == type(rhs))
@@ -60,3 +61,38 @@ class Test_Conversion(TestCase):
     def test_string(self):
         string = "Sample string"
         self.assertEqual(True, is_ok(string, guess_convert(string)))
+
+    def test_make_converter(self):
+        self.assertEqual(True, is_ok(2, make_converter('int')("2")))
+        self.assertEqual(True, is_ok(2., make_converter(float)("2")))
+        self.assertEqual(True, is_ok(True, make_converter(bool)("tRuE")))
+        self.assertEqual(True, is_ok(u"2", make_converter(str)(u"2")))
+        self.assertEqual(True, is_ok(datetime(2016, 10, 26), make_converter(datetime)("2016-10-26")))
+        self.assertEqual(True, is_ok(datetime(2016, 10, 26), make_converter('date:%d/%m/%Y')("26/10/2016")))
+        self.assertEqual(True, is_ok(4, make_converter(len)("abcd")))
+        self.assertEqual(None, make_converter('int')(None))
+        self.assertEqual(None, make_converter('float')(""))
+        self.assertRaises(ValueError, make_converter('int'), "2.1")
+        self.assertRaises(ValueError, make_converter('bool'), "yes")
+        self.assertRaises(ValueError, make_converter, 'complex')
+
+    def test_infer_type(self):
+        self.assertEqual('int', infer_type(["1", "", None, "-3"]))
+        self.assertEqual('float', infer_type(["1", "2.5"]))
+        self.assertEqual('date', infer_type(["2016-10-26", "26/10/2016"]))
+        self.assertEqual('bool', infer_type(["true", "FALSE"]))
+        self.assertEqual('str', infer_type(["1", "abc"]))
+        self.assertEqual(None, infer_type(["", None]))
+
+    def test_parse_date(self):
+        strings = [
+            "2016-10", "2016-2", "2016-10-26", "2016-1-5", "2016-10-26T12",
+            "2016-10-26 12:30", "2016-10-26T12:30:15.5", "2016-10-26T12:30:15.1234567",
+            "26/10/2016", "Oct 26 2016", "2016-10-26T12:30:15Z",
+        ]
+        for string in strings:
+            self.assertEqual(dateutil.parser.parse(string), parse_date(string))
+            self.assertEqual(dateutil.parser.parse(string), parse_date(string))
+        for string in ["gold", "", "2016-13", "2016-02-30", "2016-10-26T24:00"]:
+            self.assertRaises(ValueError, parse_date, string)
+            self.assertRaises(ValueError, parse_date, string)
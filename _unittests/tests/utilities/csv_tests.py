@@ -0,0 +1,219 @@
+################################################################################
+# base._unittests.tests.utilities.csv_tests
+#
+# Copyright 2017. Djamel Grine.
+#
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice, 
+#    this list of conditions and the following disclaimer in the documentation 
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" 
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE 
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE 
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE 
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR 
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF 
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN 
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) 
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE 
+# POSSIBILITY OF SUCH DAMAGE.
+################################################################################
+from base.utilities.csv import UnicodeCSVWriter, iter_csv, lzma, read_csv, read_csv_parallel, write_csv
+from testing import TestCase
+from datetime import datetime
+import cStringIO
+import codecs
+import collections
+import numpy as np
+import os
+import shutil
+import tempfile
+
+def csv_file(*lines):
+    return cStringIO.StringIO('\r\n'.join(lines) + '\r\n')
+
+def skip_comments(row_idx, row):
+    return row[0].startswith('#')
+
+class Test_ReadCSV(TestCase):
+    def test_guess(self):
+        records = read_csv(csv_file('date,value,name', '2016-10-26,2.5,gold', '2016-10-27,3,silver'))
+        self.assertEqual(2, len(records))
+        self.assertEqual(('date', 'value', 'name'), records[0]._fields)
+        self.assertEqual((datetime(2016, 10, 26), 2.5, 'gold'), tuple(records[0]))
+        self.assertEqual((datetime(2016, 10, 27), 3, 'silver'), tuple(records[1]))
+
+    def test_schema(self):
+        schema = {'date': 'date:%Y-%m-%d', 'value': float, 'code': 'str', 'flag': 'bool'}
+        records = read_csv(csv_file('date,value,code,flag,other', '2016-10-26,3,007,TRUE,12', '2016-10-27,,1e3,false,x'), schema = schema)
+        self.assertEqual((datetime(2016, 10, 26), 3., '007', True, 12), tuple(records[0]))
+        self.assertIs(float, type(records[0].value))
+        self.assertEqual((datetime(2016, 10, 27), None, '1e3', False, 'x'), tuple(records[1]))
+
+    def test_schema_invalid_value(self):
+        self.assertRaises(ValueError, read_csv, csv_file('value', 'abc'), schema = {'value': 'int'})
+
+    def test_sample_inference(self):
+        records = read_csv(csv_file('value,flag,date,name', '1,true,2016-10-26,a', '2.5,false,,007', 'x,TRUE,2016-10-28,1'), sample_size = 2, conversion_errors = [])
+        self.assertEqual((1., True, datetime(2016, 10, 26), 'a'), tuple(records[0]))
+        self.assertIs(float, type(records[0].value))
+        self.assertEqual((2.5, False, None, '007'), tuple(records[1]))
+        self.assertEqual('1', records[2].name)
+
+    def test_sample_conversion_errors(self):
+        errors = []
+        records = read_csv(csv_file('value,other', '1,a', '2,b', '2.5,c', ',d'), sample_size = 2, conversion_errors = errors)
+        self.assertEqual([1, 2, '2.5', None], [record.value for record in records])
+        self.assertEqual([(3, 'value', '2.5')], errors)
+        self.assertRaises(ValueError, read_csv, csv_file('value', '1', '2', '2.5'), sample_size = 2)
+
+    def test_sample_schema(self):
+        records = read_csv(csv_file('code,value', '007,1'), sample_size = 10, schema = {'code': 'str'})
+        self.assertEqual(('007', 1), tuple(records[0]))
+
+    def test_columnar(self):
+        columns = read_csv(csv_file('date,value,count,flag,name,gap', '2016-10-26,2.5,1,true,gold,', '2016-10-27,,2,false,silver,'), columnar = True, schema = {'gap': 'float'})
+        self.assertEqual(['date', 'value', 'count', 'flag', 'name', 'gap'], list(columns.keys()))
+        self.assertEqual(np.dtype('datetime64[us]'), columns['date'].dtype)
+        self.assertEqual(np.datetime64('2016-10-27', 'us'), columns['date'][1])
+        self.assertEqual(np.float64, columns['value'].dtype)
+        self.assertTrue(np.isnan(columns['value'][1]))
+        self.assertEqual([1, 2], columns['count'].tolist())
+        self.assertEqual(np.int64, columns['count'].dtype)
+        self.assertEqual(np.bool_, columns['flag'].dtype)
+        self.assertEqual([u'gold', u'silver'], columns['name'].tolist())
+        self.assertEqual(np.float64, columns['gap'].dtype)
+
+    def test_columnar_mixed(self):
+        columns = read_csv(csv_file('count,flag,other', '1,true,2016-10-26', ',,x'), columnar = True)
+        self.assertEqual(np.float64, columns['count'].dtype)
+        self.assertEqual(object, columns['flag'].dtype)
+        self.assertEqual(object, columns['other'].dtype)
+        self.assertEqual(0, len(read_csv(csv_file(), columnar = True)))
+        self.assertRaises(ValueError, read_csv, csv_file('value', '1'), columnar = True, transformer = tuple)
+
+    def test_record_type(self):
+        lines = ('date,value,name', '2016-10-26,2.5', '2016-10-27,3,silver,extra')
+        records = read_csv(csv_file(*lines), record_type = 'tuple')
+        self.assertEqual([(datetime(2016, 10, 26), 2.5, None), (datetime(2016, 10, 27), 3, 'silver')], records)
+        self.assertIs(tuple, type(records[0]))
+        self.assertEqual(records, [tuple(record) for record in read_csv(csv_file(*lines))])
+        self.assertRaises(ValueError, read_csv, csv_file(*lines), record_type = 'dict')
+
+class Test_IterCSV(TestCase):
+    def test_lazy(self):
+        parsed = []
+        def transformer(record):
+            parsed.append(record.value)
+            return record.value
+        items = iter_csv(csv_file('value', '1', '2', '3'), transformer = transformer)
+        self.assertEqual([], parsed)
+        self.assertEqual(1, next(items))
+        self.assertEqual([1], parsed)
+        self.assertEqual([2, 3], list(items))
+
+    def test_same_as_read_csv(self):
+        lines = ('# comment', 'date,value', '2016-10-26,2.5', '2016-10-27,3')
+        line_skipper = lambda row_idx, row: row[0].startswith('#')
+        self.assertEqual(
+            read_csv(csv_file(*lines), line_skipper = line_skipper),
+            list(iter_csv(csv_file(*lines), line_skipper = line_skipper))
+        )
+
+class Test_WriteCSV(TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.filename = os.path.join(self.folder, 'test.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_write_rows(self):
+        rows = [(n, u'caf\xe9 {}'.format(n), 'a,b', 2.5) for n in range(2500)]
+        for encoding in ['utf-8-sig', 'utf-8', 'latin-1']:
+            row_by_row, bulk = cStringIO.StringIO(), cStringIO.StringIO()
+            writer = UnicodeCSVWriter(row_by_row, encoding = encoding)
+            for row in rows: writer.write_row(row)
+            UnicodeCSVWriter(bulk, encoding = encoding).write_rows(rows, chunk_size = 1000)
+            self.assertEqual(row_by_row.getvalue(), bulk.getvalue())
+
+    def test_iterable(self):
+        Record = collections.namedtuple('Record', 'date value')
+        rows = [Record(datetime(2016, 10, 26), 1.5), Record(datetime(2016, 10, 27), 2.5)]
+        write_csv(self.filename, iter(rows))
+        self.assertEqual(rows, [tuple(record) for record in read_csv(self.filename)])
+        write_csv(self.filename, iter([]))
+        self.assertEqual(0, os.path.getsize(self.filename))
+
+    def test_compressed(self):
+        Record = collections.namedtuple('Record', 'date value')
+        rows = [Record(datetime(2016, 10, 26), 1.5), Record(datetime(2016, 10, 27), 2.5)]
+        for extension in ['.gz', '.bz2', '.xz'] if lzma else ['.gz', '.bz2']:
+            filename = self.filename + extension
+            write_csv(filename, rows[:1])
+            if '.bz2' == extension:
+                self.assertRaises(ValueError, write_csv, filename, rows[1:], append = True)
+                write_csv(filename, rows)
+            else:
+                write_csv(filename, rows[1:], append = True)
+            with open(filename, 'rb') as f: self.assertFalse(f.read().startswith(codecs.BOM_UTF8))
+            self.assertEqual(rows, [tuple(record) for record in read_csv(filename)])
+            self.assertEqual(rows, [tuple(record) for record in iter_csv(filename)])
+            self.assertEqual(rows, [tuple(record) for record in read_csv_parallel(filename)])
+
+    def test_append(self):
+        Record = collections.namedtuple('Record', 'date value')
+        write_csv(self.filename, [Record(datetime(2016, 10, 26), 1.5)])
+        write_csv(self.filename, [Record(datetime(2016, 10, 27), 2.5)], append = True)
+        with open(self.filename) as f:
+            records = read_csv(f)
+        self.assertEqual([(datetime(2016, 10, 26), 1.5), (datetime(2016, 10, 27), 2.5)], [tuple(record) for record in records])
+
+class Test_ReadCSVParallel(TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.filename = os.path.join(self.folder, 'test.csv')
+        lines = ['# comment', 'id,text,value']
+        texts = ['plain', '"quoted, with\r\nnewline"', '"with ""quotes"""', '', '# not a comment']
+        for n in range(1000):
+            lines.append('{},{},{}'.format(n, texts[n % len(texts)], ['1.5', '2', 'x'][n % 3]))
+            if 0 == n % 100: lines.append('# comment {}'.format(n))
+        with open(self.filename, 'wb') as f:
+            f.write('\r\n'.join(lines) + '\r\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_same_as_read_csv(self):
+        with open(self.filename, 'rb') as f:
+            expected = read_csv(f, line_skipper = skip_comments)
+        for chunk_size in [1, 100, 1 << 20]:
+            records = read_csv_parallel(self.filename, line_skipper = skip_comments, chunk_size = chunk_size, nr_processes = 2)
+            self.assertEqual(expected, records)
+            self.assertEqual(('id', 'text', 'value'), records[0]._fields)
+
+    def test_quote_in_unquoted_field(self):
+        lines = ['id,text']
+        for n in range(200): lines.append('{},{}'.format(n, ['5" pipe', '"multi\r\nline"', 'plain'][n % 3]))
+        with open(self.filename, 'wb') as f: f.write('\r\n'.join(lines) + '\r\n')
+        with open(self.filename, 'rb') as f: expected = read_csv(f)
+        self.assertEqual(200, len(expected))
+        for chunk_size in [1, 50, 1000]:
+            self.assertEqual(expected, read_csv_parallel(self.filename, chunk_size = chunk_size, nr_processes = 2))
+
+    def test_conversion_errors(self):
+        with open(self.filename, 'rb') as f:
+            expected_errors = []
+            expected = read_csv(f, line_skipper = skip_comments, sample_size = 2, conversion_errors = expected_errors)
+        errors = []
+        records = read_csv_parallel(self.filename, line_skipper = skip_comments, sample_size = 2, conversion_errors = errors, chunk_size = 1000, nr_processes = 2)
+        self.assertEqual(expected, records)
+        self.assertEqual(expected_errors, errors)
+        self.assertNotEqual([], errors)
@@ -26,12 +26,20 @@
 # POSSIBILITY OF SUCH DAMAGE.
 ################################################################################
 from base.finance.data.history.sources.bundesbank import Timeseries
+from base.finance.timeseries import registry
 
 class CPIHistory(object):
-    def __init__(self):
+    SERIES = {
+        'url': 'https://www.bundesbank.de/cae/servlet/StatisticDownload?tsId=BBXP1.M.BE.N.HICP.000000.IND.I00&its_csvFormat=en&its_fileFormat=csv&mode=its',
+        'series_name': 'cpi',
+        'description': 'CPI',
+        'unit': 'CPI',
+    }
+
+    def __init__(self, lazy = False):
         super(CPIHistory, self).__init__()
-        url = 'https://www.bundesbank.de/cae/servlet/StatisticDownload?tsId=BBXP1.M.BE.N.HICP.000000.IND.I00&its_csvFormat=en&its_fileFormat=csv&mode=its'
-        self.timeseries = Timeseries(url, 'cpi', 'CPI', 'CPI')
+        self.timeseries = registry.get('cpi', lambda: Timeseries(lazy = lazy, **self.SERIES))
+        if not lazy: self.timeseries.load()
 
     @property
     def cpis(self): return self.timeseries.data
@@ -26,6 +26,7 @@
 # POSSIBILITY OF SUCH DAMAGE.
 ################################################################################
 from base.finance.data.history.sources.bundesbank import Timeseries
+from base.finance.timeseries import registry
 
 class GoldHistory(object):
     """
@@ -35,11 +36,17 @@ class GoldHistory(object):
     Source: The London Bullion Market Association.
     Methodology: The averages were calculated from daily quotations.
     """
-    def __init__(self):
+    SERIES = {
+        'url': 'http://www.bundesbank.de/cae/servlet/StatisticDownload?tsId=BBEX3.M.XAU.{}.EA.AC.C06&its_csvFormat=en&its_fileFormat=csv&mode=its'.format('EUR'),
+        'series_name': 'gold',
+        'description': 'London fix gold prices',
+        'unit': 'EUR/oz',
+    }
+
+    def __init__(self, lazy = False):
         super(GoldHistory, self).__init__()
-        denomination = 'EUR'
-        url = 'http://www.bundesbank.de/cae/servlet/StatisticDownload?tsId=BBEX3.M.XAU.{}.EA.AC.C06&its_csvFormat=en&its_fileFormat=csv&mode=its'.format(denomination)
-        self.timeseries = Timeseries(url, 'gold', 'London fix gold prices', 'EUR/oz')
+        self.timeseries = registry.get('gold', lambda: Timeseries(lazy = lazy, **self.SERIES))
+        if not lazy: self.timeseries.load()
 
     @property
     def prices(self): return self.timeseries.data
@@ -26,27 +26,41 @@
 # POSSIBILITY OF SUCH DAMAGE.
 ################################################################################
 from base.finance.data.history.cpi import CPIHistory
-from base.finance.timeseries import Timeseries
+from base.finance.derived import DerivedTimeseries
+from base.finance.timeseries import Records, registry
+
+def compute_inflation(cpi):
+    """
+    Inflation is here calculated as the year-on-year percentage change of the CPI.
+    """
+    dates, values = cpi.dates, cpi.values_array
+
+    # The same day of the month, a year earlier
+    months = dates.astype('datetime64[M]')
+    days = dates - months.astype('datetime64[us]')
+    previous_dates = (months - 12).astype('datetime64[us]') + days
+    start_date = (months[0] + 12).astype('datetime64[us]') + days[0]
+
+    selection = dates >= start_date
+    previous_values = cpi.values(previous_dates[selection], as_array = True)
+    return Records(dates[selection], 1. - previous_values / values[selection])
+
+class InflationTimeseries(DerivedTimeseries):
+    """
+    Inflation, derived from the CPI. Like the CPI, it is kept columnar.
+    """
+    def __init__(self, **kwargs):
+        kwargs.setdefault('columnar', True)
+        parents = [lambda: CPIHistory().timeseries]
+        super(InflationTimeseries, self).__init__('inflation', parents, compute_inflation, description = 'Inflation', **kwargs)
 
 class InflationHistory(object):
-    def __init__(self):
+    def __init__(self, lazy = False):
         super(InflationHistory, self).__init__()
-        self.timeseries = self._compute_timeseries()
+        self.timeseries = registry.get('inflation', lambda: InflationTimeseries(lazy = lazy))
+        if not lazy: self.timeseries.load()
 
     @property
     def inflation_numbers(self): return self.timeseries.data
 
     def inflation(self, date): return self.timeseries.value(date)
-
-    def _compute_timeseries(self):
-        """
-        Inflation is here calculated as the year-on-year percentage change of the CPI.
-        """
-        history = CPIHistory()
-        cpi_start_date = history.timeseries.start_date
-        start_date = cpi_start_date.replace(year = cpi_start_date.year + 1)
-        Record = type(history.cpis[0])
-        cpis = [cpi for cpi in history.cpis if cpi.date >= start_date]
-        data = [Record(date = cpi.date, value = (1. - history.cpi(cpi.date.replace(year = cpi.date.year - 1)).value / cpi.value)) for cpi in cpis]
-        return Timeseries(series_name = 'inflation', description = 'Inflation', data = data)
-
@@ -25,23 +25,85 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE 
 # POSSIBILITY OF SUCH DAMAGE.
 ################################################################################
-from base.finance.timeseries import Timeseries as TimeseriesBase
+from base.finance.timeseries import Timeseries as TimeseriesBase, registry as timeseries_registry
 from base.utilities.csv import read_csv
-from base.utilities.conversion import guess_convert
+from base.utilities.conversion import parse_date
+from datetime import datetime
+from multiprocessing.pool import ThreadPool
 import urllib2
 
+def parse_period(string):
+    """
+    Converts a period, e.g. '2017-10' or '2017-10-02', to a datetime. Unlike
+    parse_date, which takes the missing day from today's date, monthly
+    periods are dated on the first of the month, so that the same period is
+    the same date whichever day it is read.
+    """
+    try:
+        return datetime.strptime(string, '%Y-%m')
+    except ValueError:
+        return parse_date(string)
+
 class LineSkipper(object):
     def __call__(self, row_idx, row):
-        date = row[0]
-        skip_line = guess_convert(date) == date
-        return skip_line
+        try:
+            parse_date(row[0])
+        except ValueError:
+            return True
+        return False
 
 class Timeseries(TimeseriesBase):
+    """
+    Series downloaded from the Bundesbank. The series are kept columnar
+    unless columnar is set to False, as they are typically held for the
+    lifetime of the process (see TimeseriesRegistry).
+    """
     def __init__(self, url, *args, **kwargs):
+        kwargs.setdefault('columnar', True)
         self._url = url # Required for _get_data_online()
         super(Timeseries, self).__init__(*args, **kwargs)
 
     def _get_data_online(self):
         fin = urllib2.urlopen(self._url)
-        return read_csv(fin, header = ['date', 'value'], line_skipper = LineSkipper())
+        return self._read(fin)
+
+    def _get_data_online_if_modified(self, validators):
+        """
+        Performs a conditional request, using the ETag and Last-Modified
+        headers of the previous response as validators.
+        """
+        request = urllib2.Request(self._url)
+        if 'etag' in validators: request.add_header('If-None-Match', validators['etag'])
+        if 'last_modified' in validators: request.add_header('If-Modified-Since', validators['last_modified'])
+        try:
+            fin = urllib2.urlopen(request)
+        except urllib2.HTTPError as error:
+            if 304 == error.code: return None, validators
+            raise
+        headers = fin.info()
+        validators = {}
+        if headers.getheader('ETag') is not None: validators['etag'] = headers.getheader('ETag')
+        if headers.getheader('Last-Modified') is not None: validators['last_modified'] = headers.getheader('Last-Modified')
+        return self._read(fin), validators
+
+    def _read(self, fin):
+        return read_csv(fin, header = ['date', 'value'], line_skipper = LineSkipper(), schema = {'date': parse_period})
 
+def load_timeseries(specs, nr_threads = None, timeseries_class = Timeseries, registry = timeseries_registry):
+    """
+    Loads several series concurrently and returns the loaded timeseries, in
+    the order of the given specs. Each spec is a dict of keyword arguments
+    for the timeseries class, e.g. GoldHistory.SERIES. 
+    The timeseries are taken from, or added to, the registry.
+    """
+    def load(spec):
+        timeseries = registry.get(spec['series_name'], lambda: timeseries_class(**spec))
+        timeseries.load()
+        return timeseries
+    if 0 == len(specs): return []
+    pool = ThreadPool(nr_threads or len(specs))
+    try:
+        return pool.map(load, specs)
+    finally:
+        pool.close()
+        pool.join()
@@ -0,0 +1,78 @@
+################################################################################
+# base.finance.derived
+#
+# Copyright 2017. Djamel Grine.
+#
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice, 
+#    this list of conditions and the following disclaimer in the documentation 
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" 
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE 
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE 
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE 
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR 
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF 
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN 
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) 
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE 
+# POSSIBILITY OF SUCH DAMAGE.
+################################################################################
+from base.finance.timeseries import Timeseries, columns
+import numpy as np
+
+class DerivedTimeseries(Timeseries):
+    """
+    Timeseries computed from parent timeseries.
+
+    The parents are given as timeseries, or as functions returning one, and
+    compute is called with the parents in the same order and must return
+    the data. The versions of the parents the data was computed from are
+    kept with the cache, in the order of the parents, so the series is 
+    only recomputed once a parent has changed. The new points are then 
+    appended to the cache, unless the recomputation changed any cached 
+    point, in which case the cache is rewritten. Derived timeseries can themselves be parents.
+    """
+    def __init__(self, series_name, parents, compute, *args, **kwargs):
+        self._parents = parents
+        self._compute = compute
+        super(DerivedTimeseries, self).__init__(series_name, *args, **kwargs)
+
+    @property
+    def parents(self):
+        return [parent if isinstance(parent, Timeseries) else parent() for parent in self._parents]
+
+    def _is_stale(self, data):
+        # Comparing the versions is left to the conditional computation
+        return True
+
+    def _get_data_online(self):
+        return self._compute(*self.parents)
+
+    def _get_data_online_if_modified(self, validators):
+        parents = self.parents
+        versions = [parent.version for parent in parents]
+        if versions == validators.get('parents'): return None, validators
+        return self._compute(*parents), {'parents': versions}
+
+    def _new_points(self, data, online_data):
+        """
+        Returns the recomputed points that follow the cached data, or None
+        in case the cached data is not an exact prefix of the recomputed
+        data: a revised parent point may change any point, not only those
+        of the tail.
+        """
+        if len(online_data) < len(data): return None
+        dates, values = columns(data)
+        online_dates, online_values = [column[:len(data)] for column in columns(online_data)]
+        if not np.array_equal(dates, online_dates): return None
+        same = (values == online_values) | (np.isnan(values) & np.isnan(online_values))
+        if not same.all(): return None
+        return online_data[len(data):]
@@ -29,7 +29,9 @@ import collections
 import numpy as np
 import matplotlib.pyplot as plt
 from base.finance.data.exchange.gfi import GFI
+from base.finance.data.history.cpi import CPIHistory
 from base.finance.data.history.gold import GoldHistory
+from base.finance.data.history.sources.bundesbank import load_timeseries
 from base.finance.data.history.inflation import InflationHistory
 from base.utilities.texttable import Texttable, bcolors, get_color_string
 from base.utilities.csv import read_csv
@@ -79,10 +81,11 @@ class Transaction(object):
     def gain(self): return self.value - self.cost
 
 class Portfolio(object):
-    def __init__(self, csv_file):
+    def __init__(self, csv_file, lazy = False):
         super(Portfolio, self).__init__()
         self.exchange = GFI()
-        self.history = GoldHistory()
+        self.history = GoldHistory(lazy = lazy)
+        self.lazy = lazy
         with open('data.csv') as f:
             self.transactions = read_csv(f, transformer = self._create_transaction)
 
@@ -147,6 +150,8 @@ class Portfolio(object):
         return report
 
     def plot(self):
+        # The inflation is derived from the CPI
+        load_timeseries([GoldHistory.SERIES, CPIHistory.SERIES])
         self._plot_distribution()
         self._plot_roi()
         self._plot_timeline()
@@ -198,7 +203,11 @@ class Portfolio(object):
         dates = [t.date for t in self.transactions] + [datetime.today()]
         investment = np.cumsum([t.cost for t in self.transactions] + [0])
         plt.plot(dates, investment, label = 'Investment')
-        historic_value = [np.sum([t.value_at_date(date) for t in self.transactions if t.date <= date]) for date in dates]
+        # Net worth at each date: the amount of gold held at that date, valued at that date's price
+        prices = self.history.timeseries.values(dates, as_array = True)
+        weights = np.array([t.quantity * t.fraction * t.weight for t in self.transactions])
+        held = np.array([t.date for t in self.transactions], dtype = 'datetime64[us]')[:, np.newaxis] <= np.array(dates, dtype = 'datetime64[us]')
+        historic_value = np.sum(weights[:, np.newaxis] * held, axis = 0) * prices
         plt.plot(dates, historic_value, label = 'Net worth')
         plt.xlabel('Time')
         plt.ylabel('EUR')
@@ -207,7 +216,7 @@ class Portfolio(object):
 
     def _plot_on_history(self):
         dates = [t.date for t in self.transactions]
-        prices = [self.history.price(date) for date in dates]
+        prices = self.history.timeseries.values(dates)
         current_price = self.history.price(datetime.today()).value
         good_prices = [p for p in prices if p.value < current_price]
         bad_prices = [p for p in prices if p.value >= current_price]
@@ -215,7 +224,7 @@ class Portfolio(object):
         plt.scatter([p.date for p in bad_prices], [p.value for p in bad_prices], color = 'red')
 
     def _plot_inflation(self):
-        inflation_history = InflationHistory()
+        inflation_history = InflationHistory(lazy = self.lazy)
         inflation_history.timeseries.plot()
 
     def _create_transaction(self, record):
@@ -26,21 +26,215 @@
 # POSSIBILITY OF SUCH DAMAGE.
 ################################################################################
 from base.py.modules import this_module_path_relative
-from base.utilities.misc import nearest_elements
-from base.utilities.csv import read_csv, write_csv
+from base.utilities.csv import appendable, read_csv, write_csv
 import matplotlib.pyplot as plt
+import numpy as np
+import collections
 from datetime import datetime
-import math
+import hashlib
+import json
 import os
+import tempfile
+import threading
+import time
+
+Record = collections.namedtuple('Record', 'date value')
+
+_EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+_MICROSECONDS_PER_DAY = 24 * 3600 * 1000000
+
+def _microseconds(date):
+    """
+    Returns the number of microseconds since the epoch, i.e. the value
+    of the datetime64[us] representation of the given datetime.
+    """
+    seconds = (date.hour * 60 + date.minute) * 60 + date.second
+    return (date.toordinal() - _EPOCH_ORDINAL) * _MICROSECONDS_PER_DAY + seconds * 1000000 + date.microsecond
+
+class Records(object):
+    """
+    Read-only sequence of records backed by a datetime64 date column and
+    a float64 value column. Records are only created when accessed.
+    """
+    def __init__(self, dates, values):
+        super(Records, self).__init__()
+        assert len(dates) == len(values), "Columns must have the same length"
+        self.dates = dates
+        self.values = values
+
+    def __len__(self): return len(self.dates)
+
+    def __getitem__(self, n):
+        if isinstance(n, slice): return Records(self.dates[n], self.values[n])
+        return Record(date = self.dates[n].item(), value = float(self.values[n]))
+
+    def __iter__(self):
+        chunk_size = 4096
+        for n in range(0, len(self), chunk_size):
+            dates = self.dates[n:n + chunk_size].tolist()
+            values = self.values[n:n + chunk_size].tolist()
+            for date, value in zip(dates, values): yield Record(date = date, value = value)
+
+def columns(data):
+    """
+    Returns the date and value columns of the given records.
+    """
+    if isinstance(data, Records): return data.dates, data.values
+    dates = np.array([p.date for p in data], dtype = 'datetime64[us]')
+    values = np.array([p.value for p in data], dtype = np.float64)
+    return dates, values
+
+# Layout of the binary files holding a series: the NumPy header records 
+# this dtype, a file with a different layout is not used
+_COLUMNS_DTYPE = np.dtype([('date', '<M8[us]'), ('value', '<f8')])
+
+def save_columns(filename, dates, values):
+    """
+    Writes the date and value columns to a binary .npy file.
+    The file is replaced atomically, so readers never see a partial file.
+    """
+    columns = np.empty(len(dates), dtype = _COLUMNS_DTYPE)
+    columns['date'] = dates
+    columns['value'] = values
+    temporary_filename = '{}.{}.tmp'.format(filename, os.getpid())
+    with open(temporary_filename, 'wb') as f: np.save(f, columns)
+    os.rename(temporary_filename, filename)
+
+def load_columns(filename):
+    """
+    Memory-maps a binary file written by save_columns() and returns its
+    records, or None in case the file is not usable.
+    """
+    try:
+        columns = np.load(filename, mmap_mode = 'r')
+    except (IOError, ValueError):
+        return None
+    if columns.dtype != _COLUMNS_DTYPE or 1 != columns.ndim: return None
+    return Records(columns['date'], columns['value'])
+
+def _periods(dates, freq):
+    """
+    Returns the period each date belongs to, and the end of each period 
+    (at midnight).
+    """
+    day = np.timedelta64(1, 'D')
+    if 'D' == freq:
+        periods = dates.astype('datetime64[D]')
+        ends = periods
+    elif 'M' == freq:
+        periods = dates.astype('datetime64[M]')
+        ends = (periods + 1).astype('datetime64[D]') - day
+    elif 'Q' == freq:
+        months = dates.astype('datetime64[M]').astype(np.int64)
+        periods = (months - months % 3).astype('datetime64[M]')
+        ends = (periods + 3).astype('datetime64[D]') - day
+    elif freq in ('A', 'Y'):
+        periods = dates.astype('datetime64[Y]')
+        ends = (periods + 1).astype('datetime64[D]') - day
+    else: raise ValueError("'{}' is not a supported frequency".format(freq))
+    return periods, ends.astype('datetime64[us]')
+
+def _values_at(dates, values, at_dates):
+    """
+    Returns the value of the first point at each of the given dates, or 
+    NaN if there is none. The dates must be in chronological order.
+    """
+    positions = np.searchsorted(dates, at_dates, side = 'left')
+    clipped = np.minimum(positions, len(dates) - 1)
+    return np.where((positions < len(dates)) & (dates[clipped] == at_dates), values[clipped], np.nan)
+
+def _rolling_sum(values, window):
+    """
+    Returns the sum over each window, computed from the cumulative sum.
+    The sum is NaN for the windows holding a NaN or infinite value only, as
+    these are left out of the cumulative sum and counted separately.
+    """
+    finite = np.isfinite(values)
+    sums = np.concatenate([[0.], np.cumsum(np.where(finite, values, 0.))])
+    nr_non_finite = np.concatenate([[0], np.cumsum(~finite)])
+    window_sums = sums[window:] - sums[:-window]
+    window_sums[nr_non_finite[window:] != nr_non_finite[:-window]] = np.nan
+    return window_sums
+
+def _rolling_extremum(values, window, ufunc, identity):
+    """
+    Returns the minimum or maximum over each window, using the van Herk/
+    Gil-Werman algorithm: with the values split in blocks of the window
+    size, each window is covered by the tail of a block and the head of 
+    the next one, whose extrema follow from running extrema within the 
+    blocks.
+    """
+    nr_blocks = -(-len(values) // window)
+    blocks = np.full(nr_blocks * window, identity)
+    blocks[:len(values)] = values
+    blocks = blocks.reshape(nr_blocks, window)
+    heads = ufunc.accumulate(blocks, axis = 1).ravel()
+    tails = ufunc.accumulate(blocks[:, ::-1], axis = 1)[:, ::-1].ravel()
+    nr_windows = len(values) - window + 1
+    return ufunc(tails[:nr_windows], heads[window - 1:window - 1 + nr_windows])
+
+def largest_triangle_three_buckets(x, y, nr_points):
+    """
+    Decimates the points (x, y) to nr_points points using the 
+    Largest-Triangle-Three-Buckets algorithm and returns their positions.
+    The first and last points are always kept, the others are split in 
+    buckets of which the point forming the largest triangle with the point
+    selected in the previous bucket and the average of the next bucket is
+    kept.
+    """
+    n = len(x)
+    if nr_points >= n: return np.arange(n)
+    assert nr_points >= 2, "At least two points are required"
+    edges = np.linspace(1, n - 1, nr_points - 1).astype(np.intp)
+    edges = np.append(edges, n)
+    positions = np.empty(nr_points, dtype = np.intp)
+    positions[0], positions[-1] = 0, n - 1
+    selected = 0
+    for k in range(nr_points - 2):
+        start, stop = edges[k], edges[k + 1]
+        average_x = np.mean(x[stop:edges[k + 2]])
+        average_y = np.mean(y[stop:edges[k + 2]])
+        areas = np.abs((x[selected] - average_x) * (y[start:stop] - y[selected]) - (x[selected] - x[start:stop]) * (average_y - y[selected]))
+        selected = start + int(np.argmax(areas))
+        positions[k + 1] = selected
+    return positions
 
 class Timeseries(object):
-    def __init__(self, series_name, description = None, unit = None, data = None):
+    """
+    Series of (date, value) points.
+
+    The points are kept as a list of records, unless columnar is set to 
+    True, in which case only a datetime64 date column and a float64 value
+    column are kept and data hands out the records on access.
+
+    Unless lazy is set to True, the data is loaded on construction. 
+    Otherwise it is loaded on first use, e.g. when accessing data or 
+    calling value().
+
+    The extension of the cached CSV file is given by csv_extension, e.g. 
+    '.csv.gz' to have it compressed (see open_file). The cache files are 
+    kept in cache_folder, or in the data folder of this package in case it
+    is None.
+    """
+    csv_extension = '.csv'
+    cache_folder = None
+
+    def __init__(self, series_name, description = None, unit = None, data = None, columnar = False, lazy = False):
         super(Timeseries, self).__init__()
-        self._filename = '{}.csv'.format(series_name)
+        self.series_name = series_name
+        self._filename = '{}{}'.format(series_name, self.csv_extension)
+        self._binary_filename = '{}.npy'.format(series_name)
+        self._validators_filename = '{}.json'.format(series_name)
         self.description = description
         self.unit = unit
-        self._data = self._get_data() if data is None else data
-        assert 0 != len(self.data), "No data available"
+        self.columnar = columnar
+        self._version = None
+        self._read_only = False
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._loaded_at = None
+        if data is not None: self._set_data(data)
+        elif not lazy: self.load()
 
     @property
     def start_date(self): return self.data[0].date
@@ -49,42 +243,539 @@ class Timeseries(object):
     def end_date(self): return self.data[-1].date
 
     @property
-    def data(self): return self._data
+    def loaded(self): return self._loaded
+
+    def load(self):
+        """
+        Loads the data, unless it is already loaded.
+        """
+        if self._loaded: return
+        with self._lock:
+            if not self._loaded: self._set_data(self._get_data())
+
+    @property
+    def data(self):
+        self.load()
+        return self._data
+
+    @property
+    def dates(self):
+        """
+        The datetime64 date column.
+        """
+        self.load()
+        return self._dates
+
+    @property
+    def values_array(self):
+        """
+        The float64 value column.
+        """
+        self.load()
+        return self._values
+
+    @property
+    def version(self):
+        """
+        Hash of the content, which changes whenever any point changes.
+        """
+        if self._version is None:
+            dates, values = self._sorted_columns()
+            digest = hashlib.sha1()
+            digest.update(np.ascontiguousarray(dates).view(np.int64).tobytes())
+            digest.update(np.ascontiguousarray(values).tobytes())
+            self._version = digest.hexdigest()
+        return self._version
+
+    def value(self, date, method = 'nearest'):
+        """
+        Returns the point at the given date according to the method:
+        - 'nearest': the nearest point, where the distance between two dates
+          is expressed in whole days. Ties are won by the point that comes
+          first in the data;
+        - 'previous': the last point at or before the date;
+        - 'next': the first point at or after the date;
+        - 'linear': a point at the date, with the value linearly 
+          interpolated between the previous and the next point.
+        Dates outside the series resolve to its first or last point.
+        """
+        self.load()
+        if 'linear' == method:
+            return Record(date = date, value = float(self._interpolate(np.array([date], dtype = 'datetime64[us]'))[0]))
+        return self.data[self._position(date, method)]
+
+    def values(self, dates, as_array = False, method = 'nearest'):
+        """
+        Batch version of value(): returns the points at each of the given 
+        dates, which can be any sequence of datetimes or a NumPy datetime64
+        array. 
+        In case as_array is set to True, a float64 array holding only the 
+        values of these points is returned instead.
+        """
+        self.load()
+        if 'linear' == method:
+            dates = np.asarray(dates, dtype = 'datetime64[us]')
+            values = self._interpolate(dates)
+            if as_array: return values
+            return [Record(date = date, value = value) for date, value in zip(dates.tolist(), values.tolist())]
+        positions = self._positions(dates, method)
+        if as_array: return self._values[positions]
+        return [self.data[n] for n in positions]
+
+    def resample(self, freq, how = 'last'):
+        """
+        Returns a new timeseries with one point per period of the given 
+        frequency: 'D' (daily), 'M' (monthly), 'Q' (quarterly) or 'A' 
+        (annual). Each point is dated at the end of its period and its value
+        aggregates the values within the period: 'first', 'last', 'mean', 
+        'sum', 'min' or 'max'. Periods without points are left out.
+        """
+        dates, values = self._sorted_columns()
+        periods, ends = _periods(dates, freq)
+        starts = np.flatnonzero(np.concatenate([[True], periods[1:] != periods[:-1]]))
+        stops = np.append(starts[1:], len(dates))
+        if 'first' == how: aggregates = values[starts]
+        elif 'last' == how: aggregates = values[stops - 1]
+        elif 'sum' == how: aggregates = np.add.reduceat(values, starts)
+        elif 'mean' == how: aggregates = np.add.reduceat(values, starts) / (stops - starts)
+        elif 'min' == how: aggregates = np.minimum.reduceat(values, starts)
+        elif 'max' == how: aggregates = np.maximum.reduceat(values, starts)
+        else: raise ValueError("'{}' is not a supported aggregation".format(how))
+        return self._derive('{}_{}'.format(self.series_name, freq), ends[starts], aggregates)
+
+    def align(self, other, how = 'inner'):
+        """
+        Puts this timeseries and the other one on a common calendar and
+        returns both as new timeseries:
+        - 'inner': the dates present in both;
+        - 'outer': the dates present in either, values missing in one of
+          them are NaN;
+        - 'asof': the dates of this timeseries, the other one takes the 
+          value of its last point at or before each date, or NaN if there
+          is none.
+        For dates occurring more than once, the earliest point is used.
+        """
+        dates, values = self._sorted_columns()
+        other_dates, other_values = other._sorted_columns()
+        if 'inner' == how: common_dates = np.intersect1d(dates, other_dates)
+        elif 'outer' == how: common_dates = np.union1d(dates, other_dates)
+        elif 'asof' == how:
+            positions = np.searchsorted(other_dates, dates, side = 'right') - 1
+            other_values = np.where(positions >= 0, other_values[np.maximum(positions, 0)], np.nan)
+            return self._derive(self.series_name, dates, values), other._derive(other.series_name, dates, other_values)
+        else: raise ValueError("'{}' is not a supported alignment".format(how))
+        if 0 == len(common_dates): raise ValueError("No common dates")
+        return self._derive(self.series_name, common_dates, _values_at(dates, values, common_dates)), \
+            other._derive(other.series_name, common_dates, _values_at(other_dates, other_values, common_dates))
 
-    def value(self, date):
-        def nearest_date(p1, p2): return math.fabs((p1.date - p2.date).days)
-        p = type(self.data[0])(date = date, value = 0)
-        return nearest_elements([p], self.data, distance = nearest_date)[0]
+    def rolling(self, window, how = 'mean'):
+        """
+        Returns a new timeseries holding a statistic over each window of the
+        given number of consecutive points: 'mean', 'std' (sample standard
+        deviation), 'min', 'max' or 'sum'. Each point is dated at the last 
+        point of its window. The cost does not depend on the window size.
+        """
+        dates, values = self._sorted_columns()
+        if not 1 <= window <= len(values): raise ValueError("Window must hold between 1 and {} points".format(len(values)))
+        if 'sum' == how: statistics = _rolling_sum(values, window)
+        elif 'mean' == how: statistics = _rolling_sum(values, window) / window
+        elif 'std' == how:
+            # Shifting by the mean limits the cancellation in the subtraction
+            finite = values[np.isfinite(values)]
+            deviations = values - (np.mean(finite) if len(finite) else 0.)
+            sums = _rolling_sum(deviations, window)
+            squares = _rolling_sum(deviations ** 2, window)
+            with np.errstate(divide = 'ignore', invalid = 'ignore'):
+                statistics = np.sqrt(np.maximum(squares - sums ** 2 / window, 0.) / (window - 1))
+        elif 'min' == how: statistics = _rolling_extremum(values, window, np.minimum, np.inf)
+        elif 'max' == how: statistics = _rolling_extremum(values, window, np.maximum, -np.inf)
+        else: raise ValueError("'{}' is not a supported statistic".format(how))
+        return self._derive('{}_{}{}'.format(self.series_name, how, window), dates[window - 1:], statistics)
+
+    @property
+    def cached_file(self): return self._cache_path(self._filename)
+
+    @property
+    def cached_binary_file(self): return self._cache_path(self._binary_filename)
 
     @property
-    def cached_file(self): return this_module_path_relative('data', self._filename)
+    def cached_validators_file(self): return self._cache_path(self._validators_filename)
 
-    def plot(self):
+    def _cache_path(self, filename):
+        if self.cache_folder is None: return this_module_path_relative('data', filename)
+        return os.path.join(self.cache_folder, filename)
+
+    def plot(self, max_points = None):
+        """
+        Plots the series. In case max_points is given, the series is first 
+        decimated to at most that many points, preserving its shape.
+        """
         fig = plt.figure()
-        dates = [p.date for p in self.data]
-        values = [p.value for p in self.data]
+        dates, values = self._sorted_columns()
+        if max_points is not None:
+            positions = largest_triangle_three_buckets(dates.view(np.int64).astype(np.float64), values, max_points)
+            dates, values = dates[positions], values[positions]
         plt.plot(dates, values)
         plt.xlabel('Time')
         if self.unit is not None: plt.ylabel(self.unit)
         if self.description is not None: plt.title(self.description)
 
+    def _set_data(self, data):
+        assert 0 != len(data), "No data available"
+        dates, values = columns(data)
+        self._dates = np.asarray(dates, dtype = 'datetime64[us]')
+        self._values = np.asarray(values, dtype = np.float64)
+        self._version = None
+        if self.columnar: self._data = Records(self._dates, self._values)
+        else: self._data = data if isinstance(data, list) else list(data)
+        self._build_index()
+        self._loaded = True
+        self._loaded_at = time.time()
+        if self._read_only: self._freeze()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _sorted_columns(self):
+        """
+        Returns the date and value columns in chronological order.
+        """
+        self.load()
+        if self._index_order is None: return self._dates, self._values
+        return self._index_dates, self._values[self._index_order]
+
+    def _derive(self, series_name, dates, values):
+        """
+        Creates a timeseries with the same description and unit. It is 
+        columnar, so that no record is created per point.
+        """
+        return Timeseries(series_name, self.description, self.unit, data = Records(dates, values), columnar = True)
+
+    def _freeze(self):
+        """
+        Makes the data read-only, so the timeseries can be shared.
+        Unless loaded, this happens once the data is loaded.
+        """
+        self._read_only = True
+        if not self._loaded: return
+        if not self.columnar: self._data = tuple(self._data)
+        for array in (self._dates, self._values, self._index_dates, self._index_order):
+            if array is not None: array.flags.writeable = False
+
+    def _build_index(self):
+        """
+        Sorts the dates once, so lookups can use a binary search.
+        The sort is stable, hence points sharing a date keep their order.
+        The index is the date column itself when the points are already
+        in chronological order.
+        """
+        if np.all(self._dates[1:] >= self._dates[:-1]):
+            self._index_order = None
+            self._index_dates = self._dates
+        else:
+            self._index_order = np.argsort(self._dates, kind = 'mergesort')
+            self._index_dates = self._dates[self._index_order]
+
+    def _position(self, date, method):
+        """
+        Returns the position in the data of the point at date, see value().
+        """
+        if 'nearest' == method: return self._nearest_position(date)
+        index = self._index_dates.view(np.int64)
+        t = _microseconds(date)
+        if 'previous' == method: n = max(int(index.searchsorted(t, side = 'right')) - 1, 0)
+        elif 'next' == method: n = min(int(index.searchsorted(t, side = 'left')), len(index) - 1)
+        else: raise ValueError("'{}' is not a supported interpolation method".format(method))
+        return n if self._index_order is None else int(self._index_order[n])
+
+    def _positions(self, dates, method):
+        """
+        Vectorized version of _position().
+        """
+        if 'nearest' == method: return self._nearest_positions(dates)
+        index = self._index_dates
+        dates = np.asarray(dates, dtype = 'datetime64[us]')
+        if 'previous' == method: n = np.maximum(np.searchsorted(index, dates, side = 'right') - 1, 0)
+        elif 'next' == method: n = np.minimum(np.searchsorted(index, dates, side = 'left'), len(index) - 1)
+        else: raise ValueError("'{}' is not a supported interpolation method".format(method))
+        return n if self._index_order is None else self._index_order[n]
+
+    def _interpolate(self, dates):
+        """
+        Returns the values at the given datetime64 dates, linearly 
+        interpolated between the surrounding points.
+        """
+        index, values = self._sorted_columns()
+        index = index.view(np.int64)
+        dates = dates.view(np.int64)
+        right = np.searchsorted(index, dates, side = 'right')
+        previous = np.clip(right - 1, 0, len(index) - 1)
+        following = np.clip(right, 0, len(index) - 1)
+        span = index[following] - index[previous]
+        weight = np.where(span > 0, (dates - index[previous]) / np.where(span > 0, span, 1).astype(np.float64), 0.)
+        return values[previous] + weight * (values[following] - values[previous])
+
+    def _nearest_position(self, date):
+        """
+        Returns the position in the data of the point nearest to date.
+        The distance is the absolute value of the (floored) number of days
+        between both dates, so several points can share the same distance: 
+        those form a contiguous block on either side of date in the index.
+        """
+        index = self._index_dates.view(np.int64)
+        t = _microseconds(date)
+        right = int(index.searchsorted(t, side = 'right'))
+        left = right - 1
+        distance_left = (t - int(index[left])) // _MICROSECONDS_PER_DAY if left >= 0 else None
+        distance_right = -((t - int(index[right])) // _MICROSECONDS_PER_DAY) if right < len(index) else None
+        if distance_right is None or (distance_left is not None and distance_left < distance_right):
+            distance = distance_left
+        else:
+            distance = distance_right
+        if distance_left == distance:
+            # Usually the block holds a single point, spare the search
+            first = left
+            bound = t - (distance + 1) * _MICROSECONDS_PER_DAY
+            if first > 0 and int(index[first - 1]) > bound: first = int(index.searchsorted(bound, side = 'right'))
+            if self._index_order is None: return first
+        if self._index_order is None: return right
+
+        # Points not in chronological order: within the blocks of equally 
+        # distant points, the one that comes first in the data wins
+        candidates = []
+        if distance_left == distance: candidates.extend(self._index_order[first:left + 1])
+        if distance_right == distance:
+            last = int(index.searchsorted(t + distance * _MICROSECONDS_PER_DAY, side = 'right'))
+            candidates.extend(self._index_order[right:last])
+        return int(min(candidates))
+
+    def _nearest_positions(self, dates):
+        """
+        Vectorized version of _nearest_position().
+        """
+        day = np.timedelta64(1, 'D')
+        index = self._index_dates
+        dates = np.asarray(dates, dtype = 'datetime64[us]')
+        right = np.searchsorted(index, dates, side = 'right')
+        left = right - 1
+        has_left = left >= 0
+        has_right = right < len(index)
+        unreachable = np.iinfo(np.int64).max
+        distance_left = np.where(has_left, (dates - index[np.maximum(left, 0)]) // day, unreachable)
+        distance_right = np.where(has_right, -((dates - index[np.minimum(right, len(index) - 1)]) // day), unreachable)
+        distance = np.minimum(distance_left, distance_right)
+        use_left = distance_left == distance
+        first = np.searchsorted(index, dates - (np.where(use_left, distance, 0) + 1) * day, side = 'right')
+        if self._index_order is None: return np.where(use_left, first, right)
+
+        # Points not in chronological order: within the blocks of equally 
+        # distant points, the one that comes first in the data wins
+        use_right = distance_right == distance
+        last = np.searchsorted(index, dates + np.where(use_right, distance, 0) * day, side = 'right')
+        order = self._index_order
+        positions = np.empty(len(dates), dtype = np.intp)
+        for n in range(len(dates)):
+            candidates = []
+            if use_left[n]: candidates.extend(order[first[n]:left[n] + 1])
+            if use_right[n]: candidates.extend(order[right[n]:last[n]])
+            positions[n] = min(candidates)
+        return positions
+
     def _get_data(self):
         data = self._get_data_offline()
         if 0 == len(data):
-            data = self._get_data_online()
-            assert 0 != len(data), "No data received"
-            write_csv(self.cached_file, data)
-            return data
-        else:
-            last_offline_date = data[-1].date
-            today = datetime.today()
-            if last_offline_date.year == today.year and last_offline_date.month != today.month:
-                data = self._get_data_online()
-                write_csv(self.cached_file, data)
+            data, validators = self._get_data_online_if_modified({})
+            assert data is not None and 0 != len(data), "No data received"
+            self._write_cache(data, validators)
+        elif self._is_stale(data):
+            data = self._refresh(data)
         return data
 
+    def _is_stale(self, data):
+        last_offline_date = data[-1].date
+        today = datetime.today()
+        return last_offline_date.year == today.year and last_offline_date.month != today.month
+
+    def _refresh(self, data):
+        """
+        Brings the cached data up to date. Nothing is downloaded in case the
+        source reports that the data did not change since the last download.
+        Otherwise the downloaded data is compared with the cached tail and
+        only the new points are appended to the cache. The whole cache is
+        only rewritten if the source revised the cached points.
+        """
+        online_data, validators = self._get_data_online_if_modified(self._read_validators())
+        if online_data is None: return data
+        assert 0 != len(online_data), "No data received"
+        new_data = self._new_points(data, online_data)
+        if new_data is None:
+            self._write_cache(online_data, validators)
+            return online_data
+        if 0 != len(new_data): 
+            data = self._append_cache(data, new_data)
+        self._write_validators(validators)
+        return data
+
+    def _new_points(self, data, online_data, tail_size = 12):
+        """
+        Returns the points of the online data that follow the cached data,
+        or None in case the online data does not extend the cached tail.
+        """
+        last_date = data[-1].date
+        dates = [p.date for p in online_data]
+        if last_date not in dates: return None
+        n = dates.index(last_date) + 1
+        tail_size = min(tail_size, len(data), n)
+        cached_tail = [tuple(p) for p in data[len(data) - tail_size:]]
+        online_tail = [tuple(p) for p in online_data[n - tail_size:n]]
+        if cached_tail != online_tail: return None
+        return online_data[n:]
+
     def _get_data_offline(self):
-        if not os.path.exists(self.cached_file): return []
-        with open(self.cached_file, 'r') as f: return read_csv(f)
+        """
+        Reads the cached data, preferring the binary cache over the CSV file
+        unless the latter has been modified since.
+        """
+        csv_exists = os.path.exists(self.cached_file)
+        if os.path.exists(self.cached_binary_file):
+            if not csv_exists or os.path.getmtime(self.cached_binary_file) >= os.path.getmtime(self.cached_file):
+                data = load_columns(self.cached_binary_file)
+                if data is not None: return data
+        if not csv_exists: return []
+        table = read_csv(self.cached_file, schema = {'date': 'date', 'value': 'float'}, columnar = True)
+        if 0 == len(table.get('date', ())): return []
+        save_columns(self.cached_binary_file, table['date'], table['value'])
+        return Records(table['date'], table['value'])
+
+    def _write_cache(self, data, validators = None):
+        """
+        Writes the data to the CSV file, which is the human-readable export,
+        and to the binary cache.
+        """
+        write_csv(self.cached_file, data)
+        save_columns(self.cached_binary_file, *columns(data))
+        self._write_validators(validators or {})
+
+    def _append_cache(self, data, new_data):
+        """
+        Appends the new points to the cache and returns all data.
+        """
+        dates, values = [np.concatenate(pair) for pair in zip(columns(data), columns(new_data))]
+        all_data = Records(dates, values) if isinstance(data, Records) else list(data) + list(new_data)
+        if appendable(self.cached_file): write_csv(self.cached_file, new_data, append = True)
+        else: write_csv(self.cached_file, all_data)
+        save_columns(self.cached_binary_file, dates, values)
+        return all_data
+
+    def _read_validators(self):
+        if not os.path.exists(self.cached_validators_file): return {}
+        with open(self.cached_validators_file, 'r') as f: return json.load(f)
+
+    def _write_validators(self, validators):
+        with open(self.cached_validators_file, 'w') as f: json.dump(validators, f)
+
+    def _get_data_online_if_modified(self, validators):
+        """
+        Returns the online data together with the validators identifying 
+        its version, e.g. an HTTP ETag. Given the validators of the cached
+        version, the data is None in case it has not changed since.
+        Sources that have no notion of validators always fetch the data.
+        """
+        return self._get_data_online(), {}
 
     def _get_data_online(self): raise NotImplementedError()
+
+class SharedTimeseries(Timeseries):
+    """
+    Timeseries whose columns live in shared memory, i.e. in a memory-mapped 
+    file under /dev/shm where available, so all processes attached to it 
+    share a single read-only copy of the data. A loaded timeseries is put in
+    shared memory by publish(), after which any process can attach to it by
+    name, e.g. in WorkerBase.setup(). Pickling only passes the name along.
+    """
+    def __init__(self, name):
+        self.name = name
+        with open(self._filename_for(name, 'json'), 'r') as f: attributes = json.load(f)
+        data = load_columns(self._filename_for(name, 'npy'))
+        assert data is not None, "'{}' is not a shared timeseries".format(name)
+        super(SharedTimeseries, self).__init__(data = data, columnar = True, **attributes)
+
+    @classmethod
+    def publish(cls, timeseries, name = None):
+        """
+        Copies the timeseries to shared memory, under the given name or else
+        its series name, and returns the shared timeseries.
+        """
+        name = name or timeseries.series_name
+        save_columns(cls._filename_for(name, 'npy'), *timeseries._sorted_columns())
+        attributes = {'series_name': timeseries.series_name, 'description': timeseries.description, 'unit': timeseries.unit}
+        with open(cls._filename_for(name, 'json'), 'w') as f: json.dump(attributes, f)
+        return cls(name)
+
+    def unlink(self):
+        """
+        Removes the timeseries from shared memory. Processes that are 
+        attached to it keep their mapping.
+        """
+        for extension in ('npy', 'json'):
+            filename = self._filename_for(self.name, extension)
+            if os.path.exists(filename): os.remove(filename)
+
+    def __reduce__(self):
+        return (SharedTimeseries, (self.name,))
+
+    @staticmethod
+    def _filename_for(name, extension):
+        folder = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+        return os.path.join(folder, 'timeseries.{}.{}'.format(name, extension))
+
+class TimeseriesRegistry(object):
+    """
+    Process-wide collection of loaded timeseries, keyed by series name.
+    The timeseries handed out are shared, hence they are made read-only.
+    An entry expires ttl seconds after its data was loaded, or never in 
+    case ttl is None. Entries registered lazily do not expire before they
+    are loaded.
+    """
+    def __init__(self, ttl = 3600):
+        super(TimeseriesRegistry, self).__init__()
+        self.ttl = ttl
+        self._entries = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, series_name, factory):
+        """
+        Returns the timeseries registered under the given name. In case 
+        there is none, or it expired, the timeseries returned by factory is
+        registered. Different series can be loaded concurrently.
+        """
+        with self._lock: lock = self._locks.setdefault(series_name, threading.Lock())
+        with lock:
+            timeseries = self._entries.get(series_name)
+            if timeseries is not None and not self._expired(timeseries): return timeseries
+            timeseries = factory()
+            timeseries._freeze()
+            self._entries[series_name] = timeseries
+            return timeseries
+
+    def invalidate(self, series_name = None):
+        """
+        Removes the given series from the registry, or all of them in case
+        no series name is given.
+        """
+        with self._lock:
+            if series_name is None: self._entries.clear()
+            else: self._entries.pop(series_name, None)
+
+    def _expired(self, timeseries):
+        if self.ttl is None or not timeseries.loaded: return False
+        return time.time() - timeseries._loaded_at >= self.ttl
+
+registry = TimeseriesRegistry()
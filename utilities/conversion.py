@@ -26,8 +26,11 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE 
 # POSSIBILITY OF SUCH DAMAGE.
 ################################################################################
+from datetime import date, datetime
 import ast
+import calendar
 import dateutil.parser
+import re
 
 def guess_convert(string):
     # Floats, ints
@@ -37,13 +40,144 @@ def guess_convert(string):
 
     # Dates
     try:
-        return dateutil.parser.parse(string)
+        return parse_date(string)
     except ValueError: pass
 
     # Booleans
-    if "true" == string.lower(): return True
-    if "false" == string.lower(): return False
+    try:
+        return parse_boolean(string)
+    except ValueError: pass
 
     # String
     return string
 
+def parse_boolean(string):
+    """
+    Converts 'true' or 'false', in any case, to a boolean.
+    """
+    value_lowercase = string.lower()
+    if "true" == value_lowercase: return True
+    if "false" == value_lowercase: return False
+    raise ValueError("'{}' is not a boolean".format(string))
+
+_year_month_regex = re.compile(r'(\d{4})-(\d{1,2})\Z')
+_iso_8601_regex = re.compile(
+    r'(\d{4})-(\d{1,2})-(\d{1,2})'
+    r'(?:[T ](\d{2})(?::(\d{2})(?::(\d{2})(?:\.(\d{1,6})\d*)?)?)?)?\Z'
+)
+_date_cache = {}
+_date_cache_day = [None]
+_date_cache_size = 10000
+
+def _parse_date_fast(string):
+    """
+    Parses the common formats 'YYYY-MM' and 'YYYY-MM-DD', optionally followed
+    by an ISO-8601 time without time zone, exactly as dateutil would. Returns
+    None for any other format.
+    """
+    match = _iso_8601_regex.match(string)
+    if match:
+        year, month, day, hour, minute, second, fraction = match.groups()
+        return datetime(
+            int(year), int(month), int(day),
+            int(hour or 0), int(minute or 0), int(second or 0),
+            int(fraction.ljust(6, '0')) if fraction else 0
+        )
+    match = _year_month_regex.match(string)
+    if match:
+        # Like dateutil, the missing day is today's, capped at the month's end
+        year, month = int(match.group(1)), int(match.group(2))
+        return datetime(year, month, min(date.today().day, calendar.monthrange(year, month)[1]))
+    return None
+
+def parse_date(string):
+    """
+    Converts a string to a datetime, accepting the same formats as dateutil.
+    The common formats are parsed directly and the other ones are memoized
+    for the day, as are the strings that are not dates, so that only unusual
+    strings are left to dateutil. Raises a ValueError for a non-date string.
+    """
+    try:
+        value = _parse_date_fast(string)
+        if value is not None: return value
+    except ValueError: pass
+    # dateutil takes the missing fields from today's date
+    today = date.today()
+    if today != _date_cache_day[0]:
+        _date_cache.clear()
+        _date_cache_day[0] = today
+    try:
+        value = _date_cache[string]
+    except KeyError:
+        try:
+            value = dateutil.parser.parse(string)
+        except ValueError:
+            value = None
+        if len(_date_cache) >= _date_cache_size: _date_cache.clear()
+        _date_cache[string] = value
+    if value is None: raise ValueError("'{}' is not a date".format(string))
+    return value
+
+_converters = {
+    'int': int,
+    'float': float,
+    'bool': parse_boolean,
+    'str': lambda string: string,
+    'date': parse_date,
+}
+
+_converter_names = {
+    int: 'int',
+    long: 'int',
+    float: 'float',
+    bool: 'bool',
+    str: 'str',
+    unicode: 'str',
+    datetime: 'date',
+}
+
+def common_type(values):
+    """
+    Returns the name of the converter, as understood by make_converter, of 
+    the type the given values share, or None if all of them are None.
+    Integers and floats widen to 'float', any other mix of types to 'str'.
+    """
+    names = set(_converter_names.get(type(value), 'str') for value in values if value is not None)
+    if not names: return None
+    if {'int', 'float'} == names: return 'float'
+    if 1 == len(names): return names.pop()
+    return 'str'
+
+def infer_type(strings):
+    """
+    Returns the name of the converter, as understood by make_converter, that
+    fits all the given strings, or None if there is no value to go by.
+    """
+    return common_type(guess_convert(string) for string in strings if string is not None and '' != string)
+
+def make_converter(spec):
+    """
+    Returns a function converting strings as per the given specification:
+    - 'int', 'float', 'bool', 'str' or the corresponding type;
+    - 'date' or datetime: a date, in any format parse_date recognizes;
+    - 'date:<format>': a date in the given strptime format;
+    - any other callable, which is used as is.
+    Unlike guess_convert, a value that does not convert raises a ValueError.
+    Missing values, i.e. None or empty strings, are converted to None.
+    """
+    if spec in _converter_names: spec = _converter_names[spec]
+    if isinstance(spec, basestring) and spec.startswith('date:'):
+        date_format = spec[len('date:'):]
+        convert = lambda string: datetime.strptime(string, date_format)
+    elif isinstance(spec, basestring):
+        if spec not in _converters: raise ValueError("'{}' is not a known converter".format(spec))
+        convert = _converters[spec]
+    elif callable(spec):
+        convert = spec
+    else:
+        raise ValueError("'{}' is not a valid converter specification".format(spec))
+    def converter(string):
+        if string is None or '' == string: return None
+        return convert(string)
+    return converter
+
@@ -26,12 +26,53 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE 
 # POSSIBILITY OF SUCH DAMAGE.
 ################################################################################
-from base.utilities.conversion import guess_convert
+from base.utilities.conversion import common_type, guess_convert, infer_type, make_converter
+import bz2
 import cStringIO
 import codecs
 import collections
+import gzip
+import itertools
+import multiprocessing
+import numpy as np
+import os
 import unicodecsv
 
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+def _open_xz(filename, mode):
+    if lzma is None: raise ImportError('Reading or writing xz files requires lzma (backports.lzma on Python 2)')
+    return lzma.open(filename, mode)
+
+# Openers of the compressed formats by extension. Python 2's bz2 module only
+# reads the first stream of a file, so bz2 files cannot be appended to.
+_openers = {
+    '.gz': gzip.open,
+    '.bz2': bz2.BZ2File,
+    '.xz': _open_xz,
+}
+
+def open_file(filename, mode = 'rb'):
+    """
+    Opens the file, which is compressed with gzip, bz2 or xz if its 
+    extension is '.gz', '.bz2' or '.xz' respectively. A compressed file is
+    decompressed, or compressed, on the fly as it is read, or written.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    return _openers.get(extension, open)(filename, mode)
+
+def appendable(filename):
+    """
+    Returns whether rows can be appended to the file, as per its extension.
+    """
+    return '.bz2' != os.path.splitext(filename)[1].lower()
+
 class UTF8Recoder(object):
     """
     Iterator that reads an encoded stream and reencodes the input to UTF-8
@@ -69,6 +110,8 @@ class UnicodeCSVWriter(object):
         self.writer = unicodecsv.writer(self.queue, dialect = dialect, **kwds)
         self.stream = f
         self.encoder = codecs.getincrementalencoder(encoding)()
+        # The queue holds UTF-8 already, only the byte order mark is missing
+        self.recode = codecs.lookup(encoding).name not in ('utf-8', 'utf-8-sig')
 
     def write_row(self, row):
         """
@@ -76,18 +119,32 @@ class UnicodeCSVWriter(object):
         """
         encoded_row = [s.encode('utf-8') if type(s) == str else s for s in row]
         self.writer.writerow(encoded_row)
+        self._flush()
+
+    def write_rows(self, rows, chunk_size = 1000):
+        """
+        Writes the rows chunk by chunk: the rows of a chunk are formatted at
+        once and reach the output in a single encoded write.
+        """
+        rows = iter(rows)
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk: break
+            self.writer.writerows(chunk)
+            self._flush()
+
+    def _flush(self):
         data = self.queue.getvalue()
-        data = data.decode('utf-8')
-        data = self.encoder.encode(data)
+        if self.recode: data = self.encoder.encode(data.decode('utf-8'))
+        else: data = self.encoder.encode(u'') + data
         self.stream.write(data)
         self.queue.truncate(0)
 
-    def write_rows(self, rows):
-        for row in rows: self.write_row(row)
-
-def read_csv(f, guess_data_types = True, header = None, line_skipper = None, transformer = None):
+def read_csv(f, guess_data_types = True, header = None, line_skipper = None, transformer = None, schema = None, sample_size = None, conversion_errors = None, columnar = False, record_type = 'namedtuple'):
     """
     Returns a list where each element type depends on the given transformer.
+    The file f is either a file object or the name of a file, which may be
+    compressed (see open_file).
     - transformer is not None:
         The given transformation functor must accept a named tuple having 
         the attributes of the CSV file's header and return an object. 
@@ -100,41 +157,325 @@ def read_csv(f, guess_data_types = True, header = None, line_skipper = None, tra
         either a string, or in case the guess_data_types is set to True,
         a best-guess of the represented data type.
 
+    The schema, in case it is given, maps column names to converters (see
+    make_converter), which are applied to their columns instead of 
+    guessing. The columns it does not mention are handled as described 
+    above.
+
+    In case a sample_size is given, the type of each column the schema does
+    not mention is inferred once from the first sample_size rows (see 
+    infer_type), after which all of its values are converted to that type.
+    Columns without values in the sample are handled as described above.
+
+    A value that fails its column's conversion raises a ValueError, unless
+    a conversion_errors list is given: the (line number, column, value) of 
+    the failure is then appended to it and the value is kept as a string.
+
     Only lines for which line_skipper returns False are presented
     to the transformer. The line_skipper functor must accept an integer and
     list of strings corresponding to the line number and row respectively.
 
     Unless a header is provided, the attributes of the named tuple are the 
     columns of the first processed row.
+
+    Setting record_type to 'tuple' makes the records plain tuples of the 
+    values, in the order of the columns, which are cheaper to create than
+    the default 'namedtuple' records.
+
+    In case columnar is set to True, an ordered dictionary mapping each 
+    column to a NumPy array of its values is returned instead, and no named
+    tuple is created. Integer, float, date and boolean columns have a typed
+    array, missing values being NaN or NaT. A transformer cannot be given.
+    """
+    if isinstance(f, basestring):
+        with open_file(f) as f:
+            return read_csv(f, guess_data_types, header, line_skipper, transformer, schema, sample_size, conversion_errors, columnar, record_type)
+    if columnar:
+        if transformer is not None: raise ValueError('A transformer cannot be applied to columnar data')
+        return _read_columns(f, guess_data_types, header, line_skipper, schema, sample_size, conversion_errors)
+    return list(iter_csv(f, guess_data_types, header, line_skipper, transformer, schema, sample_size, conversion_errors, record_type))
+
+def iter_csv(f, guess_data_types = True, header = None, line_skipper = None, transformer = None, schema = None, sample_size = None, conversion_errors = None, record_type = 'namedtuple'):
+    """
+    Generator version of read_csv(): the elements are yielded as soon as
+    their line is parsed, so the memory use does not depend on the size of
+    the file. Only the rows sampled for type inference are held at once.
+    """
+    if isinstance(f, basestring):
+        with open_file(f) as f:
+            for item in iter_csv(f, guess_data_types, header, line_skipper, transformer, schema, sample_size, conversion_errors, record_type): yield item
+        return
+    rows = _filtered_rows(f, line_skipper)
+    _, header = _read_header(rows, header)
+    if header is None: return
+    make_record = _record_factory(header, record_type)
+    specs, rows = _column_specs(header, schema, sample_size, rows)
+    converters = _make_converters(specs, guess_data_types)
+    records = itertools.imap(make_record, _convert_rows(rows, header, converters, conversion_errors))
+    for item in itertools.imap(transformer, records) if transformer else records: yield item
+
+def read_csv_parallel(filename, guess_data_types = True, header = None, line_skipper = None, transformer = None, schema = None, sample_size = None, conversion_errors = None, record_type = 'namedtuple', nr_processes = None, chunk_size = 1 << 23):
     """
-    def convert(value):
-        if guess_data_types: return guess_convert(value)
-        return value
-    def transform(record):
-        if transformer: return transformer(record)
-        return record
+    Parallel version of read_csv() for large files: the file is split into
+    byte ranges of about chunk_size bytes, ending on record boundaries, that
+    are parsed on a pool of nr_processes processes (by default, one per CPU)
+    and concatenated in order. The result is the same as read_csv's, given
+    that:
+    - the records end with a newline, optionally preceded by a carriage 
+      return, as is the case for the files written by write_csv;
+    - quotes only enclose fields, i.e. no unquoted field holds a quote.
+      Otherwise the file may be split within a record: this is detected
+      from the number of records in the ranges, and the file is then read
+      as by read_csv();
+    - the line_skipper, the transformer, the schema's converters and the
+      transformed elements can be pickled.
+    A compressed file cannot be split, so it is read as by read_csv().
+    """
+    if os.path.splitext(filename)[1].lower() in _openers:
+        return read_csv(filename, guess_data_types, header, line_skipper, transformer, schema, sample_size, conversion_errors, record_type = record_type)
+    with open(filename, 'rb') as f:
+        rows = _filtered_rows(f, line_skipper)
+        header_idx, header = _read_header(rows, header)
+        if header is None: return []
+        specs, _ = _column_specs(header, schema, sample_size, rows)
+    make_record = _record_factory(header, record_type)
+    ranges = _record_ranges(filename, chunk_size)
+    next_row_idxs = [row_idx for _, _, row_idx in ranges[1:]] + [None]
+    tasks = [
+        (filename, start, end, row_idx, next_row_idx, header_idx, header, specs, guess_data_types, line_skipper, transformer, record_type, conversion_errors is not None)
+        for (start, end, row_idx), next_row_idx in zip(ranges, next_row_idxs)
+    ]
+    if len(tasks) < 2:
+        results = map(_read_csv_range, tasks)
+    else:
+        pool = multiprocessing.Pool(nr_processes)
+        try:
+            results = pool.map(_read_csv_range, tasks)
+        finally:
+            pool.terminate()
+            pool.join()
+    if any(result is None for result in results):
+        return read_csv(filename, guess_data_types, header, line_skipper, transformer, schema, sample_size, conversion_errors, record_type = record_type)
     items = []
-    Record = None
-    reader = UnicodeCSVReader(f)
-    for row_idx, row in enumerate(reader):
-        if line_skipper is not None and line_skipper(row_idx, row): continue
-        if Record is None:
-            if header is None: header = row
-            Record = collections.namedtuple('Record', ' '.join(header))
-        else:
-            if len(row) < len(header): row = row + [None] * (len(header)-len(row))
-            elif len(row) > len(header): row = row[0:len(header)]
-            attributes = {
-                header[n]: convert(value) 
-                for n, value in enumerate(row)
-            }
-            record = Record(**attributes)
-            item = transform(record)
-            items.append(item)
+    for range_items, range_errors in results:
+        items.extend(range_items if transformer or tuple == make_record else map(make_record, range_items))
+        if conversion_errors is not None: conversion_errors.extend(range_errors)
     return items
 
-def write_csv(filename, rows, header = None):
-    with open(filename,'w') as f:
-        writer = UnicodeCSVWriter(f)
-        if header is None and len(rows) > 0: writer.write_row(rows[0]._fields)
-        writer.write_rows(rows)
+def _read_csv_range(task):
+    """
+    Parses one byte range for read_csv_parallel(). Returns the transformed
+    elements, or the tuples of converted values when there is no transformer
+    since the named tuple type cannot be pickled, and the conversion errors.
+    Returns None in case the range does not hold the number of records it
+    should, i.e. it does not end on a record boundary.
+    """
+    filename, start, end, row_idx, next_row_idx, header_idx, header, specs, guess_data_types, line_skipper, transformer, record_type, collect_errors = task
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        data = cStringIO.StringIO(f.read(end - start))
+    try:
+        records = list(enumerate(UnicodeCSVReader(data), row_idx))
+    except unicodecsv.Error:
+        return None
+    if next_row_idx is not None and row_idx + len(records) != next_row_idx: return None
+    rows = (
+        (n, row) for n, row in records
+        if n > header_idx and (line_skipper is None or not line_skipper(n, row))
+    )
+    conversion_errors = [] if collect_errors else None
+    converters = _make_converters(specs, guess_data_types)
+    items = _convert_rows(rows, header, converters, conversion_errors)
+    if transformer:
+        items = itertools.imap(transformer, itertools.imap(_record_factory(header, record_type), items))
+    else:
+        items = itertools.imap(tuple, items)
+    return list(items), conversion_errors or []
+
+def _record_ranges(filename, chunk_size):
+    """
+    Splits the file into byte ranges of about chunk_size bytes that end on 
+    a record boundary, i.e. a newline outside of quotes. Returns a list of
+    (start, end, row_idx) where row_idx is the line number the range starts
+    at, as read_csv counts them.
+    """
+    ranges = []
+    start, start_row_idx, split = 0, 0, chunk_size
+    offset, row_idx, quoted = 0, 0, False
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), ''):
+            segments = block.split('"')
+            for n, segment in enumerate(segments):
+                # Quotes toggle between quoted and unquoted segments, an 
+                # escaped quote ("") being an empty quoted segment
+                if not quoted:
+                    position = segment.find('\n', max(0, split - offset))
+                    while -1 != position:
+                        end = offset + position + 1
+                        row_idx += segment.count('\n', 0, position + 1)
+                        ranges.append((start, end, start_row_idx))
+                        start, start_row_idx, split = end, row_idx, end + chunk_size
+                        segment, offset = segment[position + 1:], end
+                        position = segment.find('\n', max(0, split - offset))
+                    row_idx += segment.count('\n')
+                offset += len(segment)
+                if n < len(segments) - 1:
+                    offset += 1
+                    quoted = not quoted
+    if start < offset: ranges.append((start, offset, start_row_idx))
+    return ranges
+
+def _read_columns(f, guess_data_types, header, line_skipper, schema, sample_size, conversion_errors):
+    """
+    Columnar version of read_csv(): the converted values are gathered per
+    column and turned into arrays, without creating a record per row.
+    """
+    rows = _filtered_rows(f, line_skipper)
+    _, header = _read_header(rows, header)
+    if header is None: return collections.OrderedDict()
+    specs, rows = _column_specs(header, schema, sample_size, rows)
+    converters = _make_converters(specs, guess_data_types)
+    columns = [[] for _ in header]
+    appends = [column.append for column in columns]
+    for values in _convert_rows(rows, header, converters, conversion_errors):
+        for append, value in zip(appends, values): append(value)
+    return collections.OrderedDict(
+        (name, _column_array(column, spec))
+        for name, column, spec in zip(header, columns, specs)
+    )
+
+_column_dtypes = {
+    'int': np.int64,
+    'float': np.float64,
+    'date': 'datetime64[us]',
+    'bool': np.bool_,
+}
+
+def _column_array(values, spec):
+    """
+    Returns the values of a column as a NumPy array, typed after the types
+    of its values or, for a column without values, after its specification.
+    Missing values, i.e. None or empty strings, are NaN in float columns and
+    NaT in date columns. With missing values, integer columns become float
+    arrays and boolean columns object arrays, as are columns of mixed types.
+    """
+    # Guessing leaves empty cells as empty strings
+    present = [value for value in values if value is not None and '' != value]
+    name = common_type(present)
+    if name is None and isinstance(spec, basestring): name = spec.split(':')[0]
+    if len(present) != len(values):
+        if 'int' == name: name = 'float'
+        if 'bool' == name: name = None
+        if name in ('float', 'date'): values = [None if '' == value else value for value in values]
+    try:
+        return np.array(values, dtype = _column_dtypes.get(name, object))
+    except OverflowError:
+        return np.array(values, dtype = object)
+
+def _read_header(rows, header):
+    """
+    Consumes the first of the rows, which is the header unless one is given.
+    Returns its line number and the header, or None for both if there is no
+    row.
+    """
+    for header_idx, row in rows:
+        return header_idx, header if header is not None else row
+    return None, None
+
+def _record_factory(header, record_type):
+    """
+    Returns the function making a record out of a row's converted values.
+    """
+    if 'namedtuple' == record_type: return collections.namedtuple('Record', ' '.join(header))._make
+    if 'tuple' == record_type: return tuple
+    raise ValueError("'{}' is not a known record type".format(record_type))
+
+def _filtered_rows(f, line_skipper, row_idx = 0):
+    """
+    Yields the line number and row of the lines line_skipper does not skip.
+    """
+    for row_idx, row in enumerate(UnicodeCSVReader(f), row_idx):
+        if line_skipper is None or not line_skipper(row_idx, row): yield row_idx, row
+
+def _column_specs(header, schema, sample_size, rows):
+    """
+    Returns the converter specification of each column, None standing for 
+    the default conversion, and the rows, the sampled ones included.
+    """
+    schema = schema or {}
+    specs = [schema.get(column) for column in header]
+    if sample_size:
+        sample = list(itertools.islice(rows, sample_size))
+        for n, spec in enumerate(specs):
+            if spec is None: specs[n] = infer_type(row[n] for _, row in sample if n < len(row))
+        rows = itertools.chain(sample, rows)
+    return specs, rows
+
+def _make_converters(specs, guess_data_types):
+    convert = _guess if guess_data_types else _keep
+    return [convert if spec is None else make_converter(spec) for spec in specs]
+
+def _guess(value):
+    # The padding of short rows is left as is
+    if value is None: return value
+    return guess_convert(value)
+
+def _keep(value):
+    return value
+
+def _convert_rows(rows, header, converters, conversion_errors):
+    """
+    Yields the list of converted values of each row.
+    """
+    width = len(header)
+    padding = [None] * width
+    keep = all(_keep is converter for converter in converters)
+    for row_idx, row in rows:
+        if len(row) < width: row.extend(padding[len(row):])
+        elif len(row) > width: del row[width:]
+        if keep:
+            yield row
+            continue
+        try:
+            values = [convert(value) for convert, value in zip(converters, row)]
+        except ValueError:
+            values = _convert_cells(row_idx, row, header, converters, conversion_errors)
+        yield values
+
+def _convert_cells(row_idx, row, header, converters, conversion_errors):
+    """
+    Converts a row that has a value failing its conversion, cell by cell.
+    """
+    values = []
+    for column, converter, value in zip(header, converters, row):
+        try:
+            values.append(converter(value))
+        except ValueError:
+            if conversion_errors is None:
+                raise ValueError("Line {}: cannot convert '{}' in column '{}'".format(row_idx, value, column))
+            conversion_errors.append((row_idx, column, value))
+            values.append(value)
+    return values
+
+def write_csv(filename, rows, header = None, append = False):
+    """
+    Writes the rows, a sequence or any iterable, to the given file, which is
+    compressed as per its extension (see open_file).
+    In case append is set to True and the file is not empty, the rows are
+    added at its end and no header is written. This is not possible for
+    bz2 files, see appendable().
+    """
+    append = append and os.path.exists(filename) and not _is_empty(filename)
+    if append and not appendable(filename): raise ValueError("Cannot append to '{}'".format(filename))
+    with open_file(filename, 'ab' if append else 'wb') as f:
+        # The byte order mark only belongs at the start of the file
+        writer = UnicodeCSVWriter(f, encoding = 'utf-8' if append else 'utf-8-sig')
+        rows = iter(rows)
+        first_row = next(rows, None)
+        if first_row is None: return
+        if not append and header is None: writer.write_row(first_row._fields)
+        writer.write_rows(itertools.chain([first_row], rows))
+
+def _is_empty(filename):
+    # The size of a compressed file says nothing about its content
+    with open_file(filename) as f: return '' == f.read(1)
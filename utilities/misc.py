@@ -26,9 +26,9 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE 
 # POSSIBILITY OF SUCH DAMAGE.
 ################################################################################
+from base.utilities.conversion import parse_date
 from collections import defaultdict
 import datetime
-import dateutil.parser
 import json
 import math
 import os
@@ -71,7 +71,7 @@ def current_timestamp(format_string = None):
     return datetime.datetime.utcnow()
 
 def parse_timestamp(ts_string):
-    return dateutil.parser.parse(ts_string)
+    return parse_date(ts_string)
 
 def parse_bool(bool_string):
     value_lowercase = bool_string.lower()